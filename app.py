@@ -1,14 +1,25 @@
 import os
 import sys
+import atexit
+import contextlib
+import functools
 import platform
 import ctypes
 import ctypes.wintypes
 import threading
 import time
 import json
+import copy
+import math
 import bisect
-import urllib.request
+import hashlib
+import heapq
+import mmap
+import struct
 import re
+import unicodedata
+from array import array
+from collections import OrderedDict
 from typing import Optional
 
 import webview
@@ -54,6 +65,9 @@ VK_CODES = {
     'Delete': 0x2E,
     'PrintScreen': 0x2C,
 
+    # Function keys (macro templates only; the page has none)
+    **{f'F{n}': 0x6F + n for n in range(1, 13)},  # 'F1'-'F12' -> 0x70-0x7B
+
     # Windows / Meta
     'Meta': 0x5B,   # Left Windows key
 
@@ -95,22 +109,78 @@ APP_NAME = 'HexKeyboard'
 MACRO_COUNT = 7
 
 WORDLIST_URL = 'https://raw.githubusercontent.com/dwyl/english-words/master/words_alpha.txt'
+WORDLIST_SHA256 = None  # hex digest to pin the download to, if any
 WORDLIST_FILENAME = 'words.txt'
 WORDLIST_EXTRA_FILENAMES = ('places.txt', 'custom.txt')
+WORDLIST_CACHE_FILENAME = 'wordlist.cache'
+WORDLIST_CHUNK_TERMS = 50000
+WORDLIST_WATCH_INTERVAL_S = 2.0
+
+# Word lists totalling PARALLEL_PARSE_MIN_BYTES+ are parsed in a process pool,
+# each file in ranges of about PARALLEL_PARSE_CHUNK_BYTES cut at line breaks.
+PARALLEL_PARSE_MIN_BYTES = 16 << 20
+PARALLEL_PARSE_CHUNK_BYTES = 4 << 20
+PARALLEL_PARSE_MAX_WORKERS = 16
+
+# Dictionary profiles: "default" is words.txt plus the extras above; others
+# come from config.json's "profiles". Inactive indexes stay loaded until they
+# take more than PROFILE_MEMORY_CAP_MB (config "profile_memory_mb") together.
+DEFAULT_PROFILE = 'default'
+PROFILE_MEMORY_CAP_MB = 64
+
+USAGE_FILENAME = 'usage.bin'
+USAGE_JOURNAL_FILENAME = 'usage.journal'
+USAGE_MAX_TERMS = 5000
+USAGE_HALF_LIFE_DAYS = 30.0
+USAGE_RESCORE_INTERVAL_S = 3600.0
+USAGE_FLUSH_INTERVAL_S = 2.0
+USAGE_FLUSH_BATCH = 32
+USAGE_COMPACT_ENTRIES = 500
+
+NGRAM_FILENAME = 'ngrams.bin'
+NGRAM_MAX_VOCAB = 0xFFFF
+NGRAM_MAX_CONTEXTS = 60000
+NGRAM_MAX_SUCCESSORS = 16
+NGRAM_BACKOFF = 0.4
+NGRAM_SAVE_INTERVAL_S = 30.0
+
+FOCUS_TIMEOUT_S = 0.05
+
+# Words before the current one kept for multi-word suggestions ("new y" -> New York).
+PHRASE_MAX_WORDS = 4
+
+# config.json writes are coalesced for this long before one atomic replace.
+CONFIG_WRITE_DELAY_S = 0.5
+
+# Latency metrics are off unless HEXKBD_METRICS=1 or Api.set_metrics_enabled.
+METRICS_ENABLED = os.getenv('HEXKBD_METRICS') == '1'
+PROFILE_SAMPLE_INTERVAL_S = 0.005
+
+# Startup phases are always timestamped; HEXKBD_STARTUP_TRACE=1 also writes
+# them to startup-*.json once the keyboard is interactive.
+STARTUP_TRACE = os.getenv('HEXKBD_STARTUP_TRACE') == '1'
 
 _hwnd_lock = threading.Lock()
 _last_target_hwnd: Optional[int] = None
 _osk_hwnd: Optional[int] = None
 
-_config_lock = threading.Lock()
+USAGE_BOOST = 1000
+
+# Typo tolerance: prefixes of FUZZY_MIN_PREFIX+ chars also match within edit
+# distance 1 (2 from FUZZY_WIDE_PREFIX chars); each edit divides the score by
+# FUZZY_PENALTY. The search stops after FUZZY_BUDGET_S regardless.
+FUZZY_MIN_PREFIX = 3
+FUZZY_WIDE_PREFIX = 6
+FUZZY_PENALTY = 8.0
+FUZZY_BUDGET_S = 0.004
+
+SUGGEST_CACHE_SIZE = 512
 
 _words_lock = threading.Lock()
-_words: Optional[list] = None
-_base_freq: Optional[dict] = None
-_display_map: Optional[dict] = None
+_word_index = None
+_active_profile = DEFAULT_PROFILE
 
 _usage_lock = threading.Lock()
-_usage = {}
 
 _aspect_ratio_lock = threading.Lock()
 _aspect_ratio: Optional[float] = None
@@ -118,6 +188,257 @@ _old_wndproc: Optional[int] = None
 _new_wndproc = None
 
 
+class _LatencyHistogram:
+    """Log-scale latency histogram: 4 buckets per doubling from 1 µs (each ~19% wide)."""
+
+    BUCKETS = 4 * 28
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        us = seconds * 1e6
+        i = int(math.log2(us) * 4) if us > 1 else 0
+        self.counts[min(i, self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the q-quantile."""
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= rank:
+                return min(2 ** ((i + 1) / 4) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(0.50) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class _Metrics:
+    """Named latency histograms, recorded only while enabled."""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            h = self._histograms.get(name)
+            if h is None:
+                h = self._histograms[name] = _LatencyHistogram()
+            h.add(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+_metrics = _Metrics(METRICS_ENABLED)
+
+
+def _timed(name: str):
+    """Decorator: record each call of the function as name while metrics are enabled."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _metrics.enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _metrics.record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def _startup_trace_path() -> str:
+    return os.path.join(_config_dir(), time.strftime('startup-%Y%m%d-%H%M%S.json'))
+
+
+def _process_age_s() -> Optional[float]:
+    """Seconds since this process was created, if the OS tells us."""
+    if kernel32 is None:
+        return None
+
+    get_current_process = kernel32.GetCurrentProcess
+    get_current_process.restype = ctypes.wintypes.HANDLE
+    get_process_times = kernel32.GetProcessTimes
+    get_process_times.argtypes = [ctypes.wintypes.HANDLE] + [ctypes.POINTER(ctypes.wintypes.FILETIME)] * 4
+    get_process_times.restype = ctypes.wintypes.BOOL
+
+    created, exited, kernel, user = (ctypes.wintypes.FILETIME() for _ in range(4))
+    if not get_process_times(get_current_process(), ctypes.byref(created), ctypes.byref(exited),
+                             ctypes.byref(kernel), ctypes.byref(user)):
+        return None
+    # FILETIME counts 100 ns ticks since 1601-01-01.
+    ticks = (created.dwHighDateTime << 32) | created.dwLowDateTime
+    return max(0.0, time.time() - (ticks - 116444736000000000) / 1e7)
+
+
+class _StartupTimeline:
+    """When each startup phase was reached, in ms since the process was created.
+
+    Phases are recorded once each (later marks of the same name are ignored),
+    with the thread that reached them; span() records name.start/name.end
+    around background work. Without a process creation time the clock starts
+    when this module finished its imports.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases = {}
+        age = _process_age_s()
+        self._origin = time.perf_counter() - (age or 0.0)
+        self.mark('process', at=self._origin)
+        self.mark('imports')
+
+    def mark(self, phase: str, at: Optional[float] = None) -> bool:
+        """Record phase as reached now (or at perf_counter value at); False if it already was."""
+        if phase in self._phases:
+            return False
+        ms = ((time.perf_counter() if at is None else at) - self._origin) * 1000
+        with self._lock:
+            if phase in self._phases:
+                return False
+            self._phases[phase] = (ms, threading.current_thread().name)
+        return True
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        self.mark(name + '.start')
+        try:
+            yield
+        finally:
+            self.mark(name + '.end')
+
+    def snapshot(self) -> list:
+        with self._lock:
+            phases = sorted(self._phases.items(), key=lambda item: item[1][0])
+        return [{'phase': name, 'ms': round(ms, 3), 'thread': thread} for name, (ms, thread) in phases]
+
+    def dump(self, path: str) -> str:
+        data = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'timeline': self.snapshot(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        return path
+
+
+_startup = _StartupTimeline()
+
+
+class _StackSampler:
+    """Sampling profiler over every thread, switchable at runtime.
+
+    cProfile only sees the thread that enables it, while bridge calls,
+    dispatch and loading each run on their own threads; sampling
+    sys._current_frames() covers them all. Samples are written as collapsed
+    stacks ("thread;outer;...;inner count"), the input format of
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = {}
+        self._samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval_s: float = PROFILE_SAMPLE_INTERVAL_S) -> bool:
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._stacks = {}
+            self._samples = 0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval_s,), daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, interval_s: float):
+        me = threading.get_ident()
+        while not self._stop.wait(interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ';'.join(reversed(stack))
+                self._stacks[key] = self._stacks.get(key, 0) + 1
+            self._samples += 1
+
+    def stop(self, path: str) -> Optional[dict]:
+        """Stop sampling and write the collapsed stacks to path."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return None
+            self._stop.set()
+            thread.join()
+            self._thread = None
+
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self._stacks.items(), key=lambda t: -t[1]):
+                f.write(f'{stack} {count}\n')
+        return {'path': path, 'samples': self._samples}
+
+
+_stack_sampler = _StackSampler()
+
+
+def _instrument_api(cls):
+    """Class decorator: time every public method of cls as api.<name>."""
+    for name, fn in list(vars(cls).items()):
+        if not name.startswith('_') and callable(fn):
+            setattr(cls, name, _timed('api.' + name)(fn))
+    return cls
+
+
 def _set_last_target_hwnd(hwnd: Optional[int]):
     global _last_target_hwnd
     with _hwnd_lock:
@@ -178,23 +499,36 @@ def _focus_window(hwnd: int):
         user32.AttachThreadInput(current_tid, foreground_tid, False)
 
 
+def _ensure_foreground(hwnd: int, timeout_s: float = FOCUS_TIMEOUT_S):
+    """Focus hwnd unless it already is foreground, then wait (briefly) until it is."""
+    if user32.GetForegroundWindow() == hwnd:
+        return
+
+    with _metrics.timer('focus.ensure_foreground'):
+        _focus_window(hwnd)
+        deadline = time.perf_counter() + timeout_s
+        while user32.GetForegroundWindow() != hwnd and time.perf_counter() < deadline:
+            time.sleep(0.002)
+
+
 def _find_window_by_title(title: str, timeout_s: float = 5.0) -> Optional[int]:
     deadline = time.time() + timeout_s
     while time.time() < deadline:
         hwnd = user32.FindWindowW(None, title)
         if hwnd:
             return hwnd
-        time.sleep(0.05)
+        time.sleep(0.01)
     return None
 
 
 def _track_last_active_window():
     """Poll the active (foreground) window and remember the last non-keyboard window."""
     while True:
-        osk = _get_osk_hwnd()
-        hwnd = _get_foreground_hwnd()
-        if hwnd and hwnd != osk:
-            _set_last_target_hwnd(hwnd)
+        with _metrics.timer('stage.track_window_tick'):
+            osk = _get_osk_hwnd()
+            hwnd = _get_foreground_hwnd()
+            if hwnd and hwnd != osk:
+                _set_last_target_hwnd(hwnd)
         time.sleep(0.1)
 
 
@@ -360,19 +694,118 @@ def _wordlist_path(filename: str) -> str:
     return os.path.join(_config_dir(), filename)
 
 
-def _download_wordlist_if_missing():
+def _stream_wordlist_download(url: str = WORDLIST_URL, sha256: Optional[str] = WORDLIST_SHA256,
+                              attempts: int = 3, chunk_size: int = 1 << 16):
+    """Download the base word list, yielding (data, progress) as the bytes arrive.
+
+    The transfer is written to words.txt.part and resumed from it with a Range
+    request (guarded by If-Range) after an interruption, whether in this run
+    or a later one. words.txt only appears once the length and, if given, the
+    sha256 check out; a mismatch removes the partial file and raises
+    ValueError, as does the server file changing (its validator differing)
+    after bytes were yielded. A server that ignores Range is downloaded from
+    the start again, yielding only the bytes the caller does not have yet.
+    """
+    # Only a first run downloads; the HTTP stack stays out of every other startup.
+    import http.client
+    import urllib.error
+    import urllib.request
+
     path = _wordlist_path(WORDLIST_FILENAME)
-    if os.path.exists(path):
-        return
+    part = path + '.part'
+    validator_path = part + '.validator'
 
-    tmp = path + '.tmp'
-    with urllib.request.urlopen(WORDLIST_URL, timeout=30) as r:
-        data = r.read()
+    try:
+        with open(validator_path, 'r', encoding='utf-8') as f:
+            validator = f.read().strip() or None
+    except OSError:
+        validator = None
+
+    fed = 0
+    error = None
+    for _ in range(attempts):
+        have = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {}
+        if have:
+            headers['Range'] = f'bytes={have}-'
+            if validator:
+                headers['If-Range'] = validator
+
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as r:
+                resumed = bool(have) and r.status == 206
+                if not resumed:
+                    current = r.headers.get('ETag') or r.headers.get('Last-Modified')
+                    if fed and validator and current and current != validator:
+                        raise ValueError('word list changed on the server during download')
+                    have = 0
+                    validator = current
+                    with open(validator_path, 'w', encoding='utf-8') as f:
+                        f.write(validator or '')
+
+                length = r.headers.get('Content-Length')
+                total = have + int(length) if length and length.isdigit() else None
+
+                # pos counts the file's bytes this attempt; only those past fed
+                # are new to the caller.
+                digest = hashlib.sha256()
+                pos = 0
+
+                def advance(data: bytes):
+                    nonlocal fed, pos
+                    digest.update(data)
+                    pos += len(data)
+                    if pos > fed:
+                        data = data[len(data) - (pos - fed):]
+                        fed = pos
+                        return data
+                    return None
+
+                # Bytes kept from an earlier run (or attempt) are hashed and go
+                # to the caller first.
+                if resumed:
+                    with open(part, 'rb') as f:
+                        for data in iter(lambda: f.read(chunk_size), b''):
+                            data = advance(data)
+                            if data:
+                                yield data, fed / total if total else 0.0
+
+                with open(part, 'ab' if resumed else 'wb') as f:
+                    while True:
+                        data = r.read(chunk_size)
+                        if not data:
+                            break
+                        f.write(data)
+                        data = advance(data)
+                        if data:
+                            yield data, fed / total if total else 0.0
+
+            if total is not None and fed != total:
+                raise OSError(f'word list download truncated at {fed} of {total} bytes')
+            break
+        except urllib.error.HTTPError as e:
+            # 416: the partial file is no prefix of what is served now.
+            if e.code == 416 and not fed:
+                os.remove(part)
+            error = e
+        except (OSError, http.client.HTTPException) as e:
+            error = e
+    else:
+        raise error
 
-    with open(tmp, 'wb') as f:
-        f.write(data)
+    if sha256 and digest.hexdigest() != sha256.lower():
+        for stale in (part, validator_path):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        raise ValueError('word list checksum mismatch')
 
-    os.replace(tmp, path)
+    os.replace(part, path)
+    try:
+        os.remove(validator_path)
+    except OSError:
+        pass
 
 
 def _copy_bundled_wordlist_extras_if_missing():
@@ -443,156 +876,2329 @@ def _parse_term_line(line: str):
     return term, display, max(1, freq)
 
 
-def _load_wordlist():
+def _fold_term(term: str) -> str:
+    """Accent-free lookup key: NFKD with combining marks dropped, casefolded (café -> cafe)."""
+    if term.isascii():
+        return term.lower()
+    decomposed = unicodedata.normalize('NFKD', term)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _alias_keys(term: str) -> list:
+    """Keys besides term itself that should find term: its accent-folded form
+    and every "word onwards" suffix of a multi-word term (folded as well)."""
+    keys = []
+    folded = _fold_term(term)
+    if folded != term:
+        keys.append(folded)
+
+    pos = term.find(' ')
+    while pos >= 0:
+        keys.append(_fold_term(term[pos + 1:]))
+        pos = term.find(' ', pos + 1)
+    return list(dict.fromkeys(keys))
+
+
+def _find_aliases(words) -> tuple:
+    """(sorted alias keys, owning term index per key) for a sorted term sequence."""
+    if isinstance(words, _PackedTerms):
+        # Only terms with a space or a non-ASCII byte have aliases; find them
+        # in the blob instead of decoding every term.
+        offsets = words.offsets
+        owners = []
+        for m in re.finditer(rb'[ \x80-\xff]', words.blob):
+            i = bisect.bisect_right(offsets, m.start()) - 1
+            if not owners or owners[-1] != i:
+                owners.append(i)
+    else:
+        owners = range(len(words))
+
+    pairs = [(key, i) for i in owners for key in _alias_keys(words[i])]
+    pairs.sort()
+    return [key for key, _ in pairs], array('I', (i for _, i in pairs))
+
+
+def _pack_terms(freqs: dict):
+    """Pack a term -> weight dict into sorted _PackedTerms and an array('I') of weights."""
+    blob = bytearray()
+    offsets = array('I', [0])
+    weights = array('I')
+    for term in sorted(freqs):
+        blob += term.encode('utf-8')
+        offsets.append(len(blob))
+        weights.append(min(freqs[term], 0xFFFFFFFF))
+    return _PackedTerms(bytes(blob), offsets), weights
+
+
+def _is_simple_titlecase(word: str) -> bool:
+    return bool(word) and word.isalpha() and word[0].isupper() and word[1:].islower()
+
+
+def _merge_display(term: str, existing: Optional[str], display: str, source: str, english: bool) -> str:
+    """Return the display form for term after seeing display from source.
+
+    existing is the current display form (None if there is none yet); english
+    is True for single words from the base list.
+    """
+    if existing is None:
+        return display
+
+    # If this term is also a common English word and the override is only a
+    # simple TitleCase (e.g. React), keep lowercase.
+    if english and _is_simple_titlecase(display):
+        return existing
+
+    # Prefer a cased (non-lowercase) display form.
+    if existing.islower() and not display.islower():
+        return display
+
+    # If the user explicitly provided casing, let it win.
+    if source == 'user' and not display.islower() and display != existing:
+        return display
+
+    return existing
+
+
+def _read_file_chunks(path: str, chunk_size: int = 1 << 16):
+    """Yield (data, progress) for a file, like _stream_wordlist_download does."""
+    total = os.path.getsize(path) or 1
+    consumed = 0
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(chunk_size), b''):
+            consumed += len(data)
+            yield data, min(1.0, consumed / total)
+
+
+def _iter_lines(chunks):
+    """Yield (line, progress) from (data, progress) byte chunks.
+
+    Chunks are only cut at line breaks, so a UTF-8 sequence split across two
+    chunks still decodes.
+    """
+    pending = b''
+    progress = 0.0
+    for data, progress in chunks:
+        pending += data
+        cut = max(pending.rfind(b'\n'), pending.rfind(b'\r')) + 1
+        if not cut:
+            continue
+        block = pending[:cut].decode('utf-8', errors='ignore')
+        pending = pending[cut:]
+        for line in block.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+            yield line, progress
+
+    if pending:
+        yield pending.decode('utf-8', errors='ignore'), progress
+
+
+def _split_file(path: str, chunk_bytes: int) -> list:
+    """[start, end) byte ranges covering path, about chunk_bytes each, cut after a line break."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        pos = chunk_bytes
+        while pos < size:
+            f.seek(pos)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            pos += chunk_bytes
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _parse_wordlist_range(path: str, start: int, end: int, with_display: bool) -> dict:
+    """_parse_wordlist_data for bytes [start, end) of path; runs in a pool worker."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return _parse_wordlist_data(data, with_display)
+
+
+def _parse_workers(total_bytes: int) -> int:
+    """Worker processes to parse total_bytes of word lists with; 0 means parse in-process."""
+    if total_bytes < PARALLEL_PARSE_MIN_BYTES:
+        return 0
+    workers = min(os.cpu_count() or 1, PARALLEL_PARSE_MAX_WORKERS)
+    return workers if workers > 1 else 0
+
+
+def _parse_file_parallel(pool, path: str, with_display: bool):
+    """Yield (partial, progress) for each byte range of path in file order.
+
+    partial is _parse_wordlist_data's result for that range; all ranges are
+    queued at once, so later ones parse while earlier ones are merged.
+    """
+    ranges = _split_file(path, PARALLEL_PARSE_CHUNK_BYTES)
+    size = ranges[-1][1] or 1
+    futures = [pool.submit(_parse_wordlist_range, path, start, end, with_display) for start, end in ranges]
+    try:
+        for (_, end), future in zip(ranges, futures):
+            yield future.result(), end / size
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _parse_pool(total_bytes: int):
+    """Context manager yielding a process pool for total_bytes of word lists, or None."""
+    workers = _parse_workers(total_bytes)
+    if not workers:
+        return contextlib.nullcontext()
+
+    import concurrent.futures
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+
+def _load_wordlist(include_base: bool = True, on_chunk=None, seed_terms=(), base_chunks=None,
+                   profile: str = DEFAULT_PROFILE):
+    """Parse the word lists into (sorted _PackedTerms, array('I') weights, display_map).
+
+    display_map only holds display forms that differ from the term. seed_terms
+    are included with weight 1 unless a list already has them. on_chunk(chunk,
+    progress) is called for every WORDLIST_CHUNK_TERMS base terms read (every
+    byte range when parsing in parallel), with progress as the fraction of the
+    base list consumed. base_chunks, an iterable of (data, progress), replaces
+    reading the base list (e.g. a download in progress). profile selects the
+    files, see _load_profiles.
+    """
     freqs = {}
     display_map = {}
     english_single = set()
 
-    def _is_simple_titlecase(word: str) -> bool:
-        return bool(word) and word.isalpha() and word[0].isupper() and word[1:].islower()
-
+    # display_map is sparse: it only holds display forms that differ from the
+    # lowercase term. A counted term without an entry displays as itself.
     def _update_display_map(term: str, display: str, source: str):
         existing = display_map.get(term)
-        if existing is None:
-            display_map[term] = display
-            return
-
-        # If this term is also a common English word and the override is only a
-        # simple TitleCase (e.g. React), keep lowercase.
-        if term in english_single and _is_simple_titlecase(display):
-            return
-
-        # Prefer a cased (non-lowercase) display form.
-        if existing.islower() and not display.islower():
-            display_map[term] = display
-            return
-
-        # If the user explicitly provided casing, let it win.
-        if source == 'user' and not display.islower() and display != existing:
+        if existing is None and term in freqs:
+            existing = term
+        display = _merge_display(term, existing, display, source, term in english_single)
+        if display == term:
+            display_map.pop(term, None)
+        else:
             display_map[term] = display
 
-    # Load the (large) base English word list first.
-    base_path = _wordlist_path(WORDLIST_FILENAME)
-    if os.path.exists(base_path):
-        with open(base_path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
+    sources = _wordlist_sources(profile)
+
+    base_path = sources[0][1]
+    read_base = include_base and base_chunks is None and bool(base_path) and os.path.exists(base_path)
+    sizes = {}
+    for key, path in (sources if read_base else sources[1:]):
+        if path and os.path.exists(path):
+            sizes[key] = os.path.getsize(path)
+
+    # Big files on disk are parsed per byte range in a process pool. Each
+    # range's partial result keeps every display form in file order, and
+    # partials are merged in range order, so the precedence rules of
+    # _update_display_map see exactly what a sequential parse would.
+    with _parse_pool(sum(sizes.values())) as pool:
+        def parse_parallel(key: str, path: str, with_display: bool, on_partial=None):
+            """Every range's partial for a large file, or None to parse it in-process."""
+            if pool is None or sizes.get(key, 0) < PARALLEL_PARSE_CHUNK_BYTES:
+                return None
+            partials = []
+            try:
+                for partial, progress in _parse_file_parallel(pool, path, with_display):
+                    partials.append(partial)
+                    if on_partial is not None:
+                        on_partial(partial, progress)
+            except Exception:
+                # A broken pool: the sequential parse below redoes the file
+                # (on_chunk may see some terms twice, which layers tolerate).
+                return None
+            return partials
+
+        # Load the (large) base English word list first.
+        if read_base:
+            partials = parse_parallel(sources[0][0], base_path, False, on_chunk)
+            if partials is None:
+                base_chunks = _read_file_chunks(base_path)
+            else:
+                for partial in partials:
+                    for term, freq in partial.items():
+                        freqs[term] = freqs.get(term, 0) + freq
+                english_single.update(term for term in freqs if ' ' not in term)
+
+        if include_base and base_chunks is not None:
+            chunk = {}
+            for line, progress in _iter_lines(base_chunks):
                 parsed = _parse_term_line(line)
                 if not parsed:
                     continue
 
                 term, display, freq = parsed
                 freqs[term] = freqs.get(term, 0) + freq
-                display_map[term] = term
                 if ' ' not in term:
                     english_single.add(term)
 
-    # First: load bundled display forms (for capitalization), but don't affect weights.
-    for filename in WORDLIST_EXTRA_FILENAMES:
-        bundled = resource_path(filename)
-        if not os.path.exists(bundled):
-            continue
+                if on_chunk is not None:
+                    chunk[term] = chunk.get(term, 0) + freq
+                    if len(chunk) >= WORDLIST_CHUNK_TERMS:
+                        on_chunk(chunk, progress)
+                        chunk = {}
 
-        with open(bundled, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                parsed = _parse_term_line(line)
-                if not parsed:
+            if on_chunk is not None and chunk:
+                on_chunk(chunk, 1.0)
+
+        # First: load bundled display forms (for capitalization), but don't affect
+        # weights. Then: the user's extra dictionaries (weights + display).
+        for key, path in sources[1:]:
+            if not os.path.exists(path):
+                continue
+
+            source = key.partition(':')[0]
+            partials = parse_parallel(key, path, True)
+            if partials is not None:
+                for partial in partials:
+                    for term, (freq, displays) in partial.items():
+                        if source == 'user':
+                            freqs[term] = freqs.get(term, 0) + freq
+                        for display in displays:
+                            _update_display_map(term, display, source)
+                continue
+
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    parsed = _parse_term_line(line)
+                    if not parsed:
+                        continue
+
+                    term, display, freq = parsed
+                    if source == 'user':
+                        freqs[term] = freqs.get(term, 0) + freq
+                    _update_display_map(term, display, source)
+
+    for term in seed_terms:
+        freqs.setdefault(term, 1)
+
+    # Bundled display forms for terms that never got a weight are never shown.
+    for term in [t for t in display_map if t not in freqs]:
+        del display_map[term]
+
+    terms, weights = _pack_terms(freqs)
+    return terms, weights, display_map
+
+
+class _CompletionIndex:
+    """Sorted term array plus a max-score segment tree for exact top-k prefix queries.
+
+    A prefix maps to a contiguous range of the sorted terms; the tree answers
+    "best term in range" in O(log n), so the top k cost O(k log n) no matter
+    how many terms share the prefix. Usage updates are O(log n) point updates.
+
+    Terms are also reachable through their _alias_keys (cafe -> café,
+    york -> new york): aliases is a second index over those keys, with
+    _alias_owner mapping each key back to its term and the same scores.
+    aliases=(keys, owners) passes them precomputed, e.g. from the cache.
+    """
+
+    def __init__(self, words, weights, display_map: dict, tree: Optional[array] = None,
+                 aliases: Optional[tuple] = None):
+        self.words = words
+        self.display_map = display_map
+        self._child_cache = {}
+
+        self._base = weights
+        self._scores = array('d', weights)
+        self._lock = threading.Lock()
+
+        if tree is None:
+            tree = self._build_tree(self._scores)
+        self._size = len(tree) // 2
+        self._tree = tree
+
+        if aliases is None:
+            aliases = _find_aliases(words)
+        keys, owner = aliases
+        self.aliases = None
+        self._alias_owner = owner
+        if len(keys):
+            self.aliases = _CompletionIndex(keys, array('I', (weights[i] for i in owner)), {},
+                                            aliases=((), ()))
+
+    @staticmethod
+    def _build_tree(scores) -> array:
+        """Segment tree of argmaxes over scores (ties to the lower index)."""
+        n = len(scores)
+        size = 1
+        while size < n:
+            size <<= 1
+
+        tree = array('i', [-1]) * (2 * size)
+        tree[size:size + n] = array('i', range(n))
+        for node in range(size - 1, 0, -1):
+            a = tree[2 * node]
+            b = tree[2 * node + 1]
+            if b < 0 or (a >= 0 and scores[a] >= scores[b]):
+                tree[node] = a
+            else:
+                tree[node] = b
+        return tree
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _better(self, a: int, b: int) -> int:
+        # Higher score wins; ties go to the lower index (alphabetical order).
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        sa = self._scores[a]
+        sb = self._scores[b]
+        if sa > sb or (sa == sb and a < b):
+            return a
+        return b
+
+    def _argmax(self, lo: int, hi: int) -> int:
+        tree = self._tree
+        best = -1
+        lo += self._size
+        hi += self._size
+        while lo < hi:
+            if lo & 1:
+                best = self._better(best, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self._better(best, tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def prefix_range(self, prefix: str, lo: int = 0, hi: Optional[int] = None):
+        """Return the [start, end) slice of terms starting with prefix."""
+        words = self.words
+        if hi is None:
+            hi = len(words)
+
+        start = bisect.bisect_left(words, prefix, lo, hi)
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1) if ord(prefix[-1]) < 0x10FFFF else None
+        if upper is None:
+            end = hi
+        else:
+            end = bisect.bisect_left(words, upper, start, hi)
+        return start, end
+
+    def top_k(self, lo: int, hi: int, k: int) -> list:
+        """Return up to k term indexes in [lo, hi), best score first."""
+        out = []
+        with self._lock:
+            scores = self._scores
+            best = self._argmax(lo, hi)
+            if best < 0:
+                return out
+
+            heap = [(-scores[best], best, lo, hi)]
+            while heap and len(out) < k:
+                _, i, a, b = heapq.heappop(heap)
+                out.append(i)
+                for sub_lo, sub_hi in ((a, i), (i + 1, b)):
+                    if sub_lo < sub_hi:
+                        j = self._argmax(sub_lo, sub_hi)
+                        heapq.heappush(heap, (-scores[j], j, sub_lo, sub_hi))
+        return out
+
+    def score(self, i: int) -> float:
+        return self._scores[i]
+
+    def display(self, i: int) -> str:
+        w = self.words[i]
+        return self.display_map.get(w, w) if self.display_map else w
+
+    def find(self, term: str) -> int:
+        """Index of term, or -1 if it is not indexed."""
+        words = self.words
+        i = bisect.bisect_left(words, term)
+        if i >= len(words) or words[i] != term:
+            return -1
+        return i
+
+    def entry(self, term: str):
+        """(weight, display) for term, or None if it is not indexed."""
+        i = self.find(term)
+        if i < 0:
+            return None
+        return self._base[i], self.display(i)
+
+    def items(self):
+        """Yield (term, weight, display) in term order."""
+        words = self.words
+        display_map = self.display_map
+        base = self._base
+        for i in range(len(words)):
+            w = words[i]
+            yield w, base[i], display_map.get(w, w)
+
+    def _rescore(self, i: int, score: float):
+        with self._lock:
+            self._scores[i] = score
+            tree = self._tree
+            node = (i + self._size) >> 1
+            while node:
+                tree[node] = self._better(tree[2 * node], tree[2 * node + 1])
+                node >>= 1
+
+    def set_usage(self, term: str, count: int) -> bool:
+        """Rescore term for a new usage count; False if the term is not indexed."""
+        i = self.find(term)
+        if i < 0:
+            return False
+
+        score = self._base[i] + count * USAGE_BOOST
+        self._rescore(i, score)
+
+        aliases = self.aliases
+        if aliases is not None:
+            keys, owner = aliases.words, self._alias_owner
+            for key in _alias_keys(term):
+                j = bisect.bisect_left(keys, key)
+                while j < len(keys) and keys[j] == key:
+                    if owner[j] == i:
+                        aliases._rescore(j, score)
+                    j += 1
+        return True
+
+    def _alias_matches(self, prefix: str, k: int) -> list:
+        """Up to k term indexes with an alias key starting with prefix, best first."""
+        aliases = self.aliases
+        if aliases is None:
+            return []
+
+        lo, hi = aliases.prefix_range(_fold_term(prefix))
+        owner = self._alias_owner
+        want = k
+        while True:
+            ids = aliases.top_k(lo, hi, want)
+            # A term can own several matching keys ("new york new ...").
+            out = list(dict.fromkeys(owner[j] for j in ids))
+            if len(out) >= k or len(ids) < want:
+                return out[:k]
+            want *= 2
+
+    def top_matches(self, prefix: str, lo: int, hi: int, k: int) -> list:
+        """top_k of prefix's range [lo, hi) merged with terms an alias key matches."""
+        exact = self.top_k(lo, hi, k)
+        inner = self._alias_matches(prefix, k)
+        if not inner:
+            return exact
+
+        scores = self._scores
+        return sorted(set(exact).union(inner), key=lambda i: (-scores[i], i))[:k]
+
+    def _children(self, q: str, lo: int, hi: int) -> list:
+        """(char, start, end) for each distinct next character under q's range."""
+        cached = self._child_cache.get(q)
+        if cached is not None:
+            return cached
+
+        words = self.words
+        depth = len(q)
+        out = []
+        i = lo
+        while i < hi:
+            w = words[i]
+            if len(w) <= depth:
+                i += 1
+                continue
+            c = w[depth]
+            _, j = self.prefix_range(q + c, i, hi)
+            out.append((c, i, j))
+            i = j
+
+        # Shallow nodes are shared by nearly every fuzzy query; keep them.
+        if depth <= 3:
+            self._child_cache[q] = out
+        return out
+
+    def warm_children(self, depth: int = 2):
+        """Precompute the child tables of the shallow nodes every fuzzy walk starts from."""
+        level = [('', 0, len(self.words))]
+        for _ in range(depth + 1):
+            nxt = []
+            for q, lo, hi in level:
+                for c, a, b in self._children(q, lo, hi):
+                    nxt.append((q + c, a, b))
+            level = nxt
+
+    def fuzzy_matches(self, prefix: str, exact: list, k: int, deadline: float, cancelled=None) -> dict:
+        """Map term index -> edit distance for the k best completions of prefix, typos included.
+
+        Searches at distance 1 first and widens to 2 only for long prefixes and
+        only while time remains; the walk stops at deadline regardless, or as
+        soon as cancelled() returns True.
+        """
+        found = {i: 0 for i in exact}
+        max_dist = 1 if len(prefix) < FUZZY_WIDE_PREFIX else 2
+        for dist in range(1, max_dist + 1):
+            if not self._fuzzy_walk(prefix, dist, found, k, deadline, cancelled):
+                break
+        return found
+
+    def _fuzzy_walk(self, prefix: str, max_dist: int, found: dict, k: int, deadline: float,
+                    cancelled=None) -> bool:
+        """Add completions within max_dist of prefix to found; False if the deadline hit or cancelled.
+
+        Walks the implicit trie of the sorted terms best-first, carrying an
+        optimal-string-alignment row (substitution, insertion, deletion and
+        adjacent transposition) for the typed prefix. A subtree is skipped once
+        its best score, discounted by its minimum possible distance, cannot beat
+        the current k-th candidate.
+        """
+        m = len(prefix)
+        scores = self._scores
+
+        def kth_best():
+            if len(found) < k:
+                return None
+            return heapq.nlargest(k, (scores[i] / FUZZY_PENALTY ** d for i, d in found.items()))[-1]
+
+        threshold = kth_best()
+
+        # Best-first on the row minimum (a lower bound for every descendant),
+        # deepest first among equals so close matches are reached early.
+        heap = [(0, 0, '', 0, len(self.words), list(range(m + 1)), None)]
+        while heap:
+            if time.perf_counter() > deadline or (cancelled is not None and cancelled()):
+                return False
+
+            lowest, _, q, lo, hi, row, prev = heapq.heappop(heap)
+
+            if threshold is not None:
+                best = self._argmax(lo, hi)
+                if best < 0 or scores[best] / FUZZY_PENALTY ** lowest < threshold:
+                    continue
+
+            dist = row[m]
+            if q and dist <= max_dist:
+                changed = False
+                for i in self.top_k(lo, hi, k):
+                    if found.get(i, max_dist + 1) > dist:
+                        found[i] = dist
+                        changed = True
+                if changed:
+                    threshold = kth_best()
+
+                # The row minimum never decreases further down, so no deeper
+                # node can match more closely than this one.
+                if dist == lowest:
                     continue
 
-                term, display, _freq = parsed
-                _update_display_map(term, display, 'bundled')
+            last = q[-1] if q else None
+            if lowest < max_dist:
+                children = self._children(q, lo, hi)
+            else:
+                # No edits left: only a character that continues an exact
+                # alignment (or completes a transposition) can stay in budget.
+                chars = {prefix[j] for j in range(m) if row[j] <= max_dist}
+                if prev is not None:
+                    chars.update(prefix[j] for j in range(m - 1) if prev[j] < max_dist)
+
+                children = []
+                for c in sorted(chars):
+                    a, b = self.prefix_range(q + c, lo, hi)
+                    if a < b:
+                        children.append((c, a, b))
+
+            for c, a, b in children:
+                new = [row[0] + 1]
+                for j in range(1, m + 1):
+                    v = min(new[j - 1] + 1, row[j] + 1, row[j - 1] + (prefix[j - 1] != c))
+                    if prev is not None and j > 1 and c == prefix[j - 2] and last == prefix[j - 1]:
+                        v = min(v, prev[j - 2] + 1)
+                    new.append(v)
+
+                low = min(new)
+                if low <= max_dist:
+                    heapq.heappush(heap, (low, -len(q) - 1, q + c, a, b, new, row))
+
+        return True
+
+    def complete(self, prefix: str, lo: int, hi: int, limit: int, cancelled=None) -> list:
+        """Top term indexes for prefix (whose exact range is [lo, hi)), typos included.
+
+        Typo matches only fill the slots exact and alias matches leave free, so
+        a heavy place name one edit away never displaces the word being typed.
+        """
+        exact = self.top_matches(prefix, lo, hi, limit)
+        if len(prefix) < FUZZY_MIN_PREFIX or len(exact) >= limit:
+            return exact
+
+        found = self.fuzzy_matches(prefix, exact, limit, time.perf_counter() + FUZZY_BUDGET_S, cancelled)
+
+        scores = self._scores
+        typos = sorted((i for i, d in found.items() if d),
+                       key=lambda i: (-scores[i] / FUZZY_PENALTY ** found[i], i))
+        return exact + typos[:limit - len(exact)]
+
+    def suggest(self, prefix: str, limit: int, cancelled=None) -> list:
+        lo, hi = self.prefix_range(prefix)
+        return [self.display(i) for i in self.complete(prefix, lo, hi, limit, cancelled)]
+
+
+class _PackedTerms:
+    """Read-only sorted term sequence over a UTF-8 blob and an offsets array.
+
+    Terms are decoded on access, so bisect runs over one contiguous buffer (in
+    memory or memory-mapped from the cache) instead of a Python string per term.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
 
-    # Then: load the user's extra dictionaries (weights + display).
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        o = self.offsets
+        return str(self.blob[o[i]:o[i + 1]], 'utf-8')
+
+
+_CACHE_MAGIC = b'HXKWL\x00\x00\x03'
+_CACHE_HEADER = struct.Struct('<8sI')
+
+
+def _load_profiles() -> dict:
+    """name -> word list filenames for every profile, DEFAULT_PROFILE included.
+
+    Profiles come from config.json, e.g. "profiles": {"medical": ["words.txt",
+    "medical.txt"]}. words.txt, if listed, is loaded as the base English list;
+    every other file is weighted like custom.txt. DEFAULT_PROFILE maps to None
+    (the built-in set).
+    """
+    raw = _config.get('profiles')
+
+    profiles = {DEFAULT_PROFILE: None}
+    if not isinstance(raw, dict):
+        return profiles
+
+    for name, files in raw.items():
+        if not isinstance(name, str) or not re.fullmatch(r'[A-Za-z0-9_-]{1,32}', name):
+            continue
+        if name == DEFAULT_PROFILE or not isinstance(files, list):
+            continue
+        files = [f for f in files if isinstance(f, str) and f and os.path.basename(f) == f]
+        if files:
+            profiles[name] = files
+    return profiles
+
+
+def _wordlist_cache_path(profile: str = DEFAULT_PROFILE) -> str:
+    if profile == DEFAULT_PROFILE:
+        return _wordlist_path(WORDLIST_CACHE_FILENAME)
+    return _wordlist_path(f'wordlist.{profile}.cache')
+
+
+def _wordlist_sources(profile: str = DEFAULT_PROFILE) -> list:
+    """(key, path) for every file that feeds _load_wordlist, in load order."""
+    if profile != DEFAULT_PROFILE:
+        files = _load_profiles().get(profile) or []
+        sources = [('base', _wordlist_path(WORDLIST_FILENAME) if WORDLIST_FILENAME in files else '')]
+        sources.extend(('user:' + f, _wordlist_path(f)) for f in files if f != WORDLIST_FILENAME)
+        return sources
+
+    sources = [('base', _wordlist_path(WORDLIST_FILENAME))]
+    for filename in WORDLIST_EXTRA_FILENAMES:
+        sources.append(('bundled:' + filename, resource_path(filename)))
     for filename in WORDLIST_EXTRA_FILENAMES:
-        path = _wordlist_path(filename)
-        if not os.path.exists(path):
+        sources.append(('user:' + filename, _wordlist_path(filename)))
+    return sources
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _fingerprint_sources(sources: list) -> dict:
+    out = {}
+    for key, path in sources:
+        try:
+            st = os.stat(path)
+        except OSError:
+            out[key] = None
             continue
 
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                parsed = _parse_term_line(line)
-                if not parsed:
-                    continue
+        out[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': _file_sha256(path)}
+    return out
 
-                term, display, freq = parsed
-                freqs[term] = freqs.get(term, 0) + freq
-                _update_display_map(term, display, 'user')
 
-    words = sorted(freqs.keys())
-    return words, freqs, display_map
+def _sources_match(recorded: dict, sources: list) -> bool:
+    if not isinstance(recorded, dict) or set(recorded) != {key for key, _ in sources}:
+        return False
 
+    for key, path in sources:
+        fp = recorded[key]
+        try:
+            st = os.stat(path)
+        except OSError:
+            if fp is not None:
+                return False
+            continue
 
-def _init_wordlist_background():
-    global _words, _base_freq, _display_map
+        if fp is None or fp.get('size') != st.st_size:
+            return False
 
+        # Size and mtime unchanged: trust it without hashing. A touched but
+        # identical file (e.g. a fresh PyInstaller temp dir) still matches by hash.
+        if fp.get('mtime_ns') == st.st_mtime_ns:
+            continue
+        if fp.get('sha256') != _file_sha256(path):
+            return False
+
+    return True
+
+
+def _save_compiled_wordlist(index: '_CompletionIndex', fingerprints: dict, profile: str = DEFAULT_PROFILE):
+    words = index.words
+    if not isinstance(words, _PackedTerms):
+        words = _pack_terms(dict.fromkeys(words, 1))[0]
+    blob, offsets = words.blob, words.offsets
+
+    weights = array('I', (min(int(x), 0xFFFFFFFF) for x in index._base))
+
+    display_idx = array('I')
+    display_offsets = array('I', [0])
+    display_blob = bytearray()
+    for term, display in sorted(index.display_map.items()):
+        if display == term:
+            continue
+        i = bisect.bisect_left(words, term)
+        if i >= len(words) or words[i] != term:
+            continue
+        display_idx.append(i)
+        display_blob += display.encode('utf-8')
+        display_offsets.append(len(display_blob))
+
+    alias_offsets = array('I', [0])
+    alias_blob = bytearray()
+    if index.aliases is not None:
+        for key in index.aliases.words:
+            alias_blob += key.encode('utf-8')
+            alias_offsets.append(len(alias_blob))
+
+    payloads = [
+        ('offsets', offsets.tobytes()),
+        ('blob', bytes(blob)),
+        ('weights', weights.tobytes()),
+        # The live tree reflects usage boosts; the cache must match its base weights.
+        ('tree', _CompletionIndex._build_tree(array('d', weights)).tobytes()),
+        ('display_idx', display_idx.tobytes()),
+        ('display_offsets', display_offsets.tobytes()),
+        ('display_blob', bytes(display_blob)),
+        ('alias_offsets', alias_offsets.tobytes()),
+        ('alias_blob', bytes(alias_blob)),
+        ('alias_owner', array('I', index._alias_owner).tobytes()),
+    ]
+
+    # Sections are laid out after the header at 8-byte aligned offsets
+    # relative to the start of the data area.
+    sections = {}
+    pos = 0
+    for name, data in payloads:
+        sections[name] = [pos, len(data)]
+        pos += (len(data) + 7) & ~7
+
+    header = json.dumps({'sources': fingerprints, 'count': len(words), 'sections': sections}).encode('utf-8')
+    prefix_len = _CACHE_HEADER.size + len(header)
+    pad = (-prefix_len) & 7
+
+    path = _wordlist_cache_path(profile)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_CACHE_HEADER.pack(_CACHE_MAGIC, len(header)))
+        f.write(header)
+        f.write(b'\x00' * pad)
+        for _, data in payloads:
+            f.write(data)
+            f.write(b'\x00' * ((-len(data)) & 7))
+
+    # Windows refuses to replace a file that is still mapped, as the cache is
+    # by an index loaded from it; the new one then waits beside it for
+    # _load_compiled_wordlist to move it into place.
     try:
-        _download_wordlist_if_missing()
-    except Exception:
+        os.replace(tmp, path)
+    except OSError:
+        os.replace(tmp, path + '.next')
+        return
+
+    try:
+        os.remove(path + '.next')
+    except OSError:
         pass
 
+
+def _load_compiled_wordlist(sources: list, profile: str = DEFAULT_PROFILE) -> Optional['_CompletionIndex']:
+    """Map profile's compiled cache if it is current for sources, else return None."""
+    path = _wordlist_cache_path(profile)
+    pending = path + '.next'
+    if os.path.exists(pending):
+        # Saved while the old cache was mapped; if that one is still mapped,
+        # read the pending file where it is.
+        try:
+            os.replace(pending, path)
+        except OSError:
+            path = pending
+
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
     try:
-        _copy_bundled_wordlist_extras_if_missing()
+        magic, header_len = _CACHE_HEADER.unpack_from(mm, 0)
+        header = None
+        if magic == _CACHE_MAGIC:
+            header = json.loads(mm[_CACHE_HEADER.size:_CACHE_HEADER.size + header_len])
+    except (struct.error, ValueError):
+        header = None
+
+    if not isinstance(header, dict) or not _sources_match(header.get('sources'), sources):
+        mm.close()
+        return None
+
+    # From here on the views keep the mapping alive; on failure it is released
+    # together with them.
+    try:
+        base = _CACHE_HEADER.size + header_len
+        base += (-base) & 7
+        view = memoryview(mm)
+
+        def section(name: str):
+            off, size = header['sections'][name]
+            return view[base + off:base + off + size]
+
+        words = _PackedTerms(section('blob'), section('offsets').cast('I'))
+        if len(words) != header['count']:
+            return None
+
+        display_idx = section('display_idx').cast('I')
+        display_offsets = section('display_offsets').cast('I')
+        display_blob = section('display_blob')
+        display_map = {}
+        for n, i in enumerate(display_idx):
+            display_map[words[i]] = str(display_blob[display_offsets[n]:display_offsets[n + 1]], 'utf-8')
+
+        tree = array('i')
+        tree.frombytes(section('tree'))
+
+        aliases = (_PackedTerms(section('alias_blob'), section('alias_offsets').cast('I')),
+                   section('alias_owner').cast('I'))
+        return _CompletionIndex(words, section('weights').cast('I'), display_map, tree, aliases)
+    except Exception:
+        return None
+
+
+class _SuggestSession:
+    """Suggestion state for the word being typed.
+
+    Keeps one (prefix, start, end, results) frame per prefix seen for the
+    current word. Typing another letter narrows the previous frame's range;
+    backspace pops back to the cached frame for the shorter prefix.
+    """
+
+    MAX_DEPTH = 64
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._frames = []
+
+    def reset(self):
+        with self._lock:
+            self._index = None
+            self._frames = []
+
+    def suggest(self, index: '_CompletionIndex', prefix: str, limit: int, cancelled=None) -> list:
+        with self._lock:
+            frames = self._frames
+            if index is not self._index:
+                self._index = index
+                frames.clear()
+
+            while frames and not prefix.startswith(frames[-1][0]):
+                frames.pop()
+
+            if frames and frames[-1][0] == prefix:
+                results = frames[-1][3]
+                if limit in results:
+                    return results[limit]
+                lo, hi = frames[-1][1], frames[-1][2]
+            else:
+                if frames:
+                    lo, hi = index.prefix_range(prefix, frames[-1][1], frames[-1][2])
+                else:
+                    lo, hi = index.prefix_range(prefix)
+
+                if len(frames) >= self.MAX_DEPTH:
+                    frames.pop(0)
+                frames.append((prefix, lo, hi, {}))
+
+            out = [index.display(i) for i in index.complete(prefix, lo, hi, limit, cancelled)]
+            if cancelled is None or not cancelled():
+                frames[-1][3][limit] = out
+            return out
+
+
+_suggest_session = _SuggestSession()
+
+
+def _suggest_phrase(index, phrase: str, limit: int, complete) -> list:
+    """Suggestions for the last few words typed, e.g. "new y".
+
+    Multi-word terms continuing the longest matching tail of the phrase come
+    first, then complete(index, last_word, limit) fills the rest.
+    """
+    words = phrase.split(' ')
+    found = []
+    for start in range(len(words) - 1):
+        tail = ' '.join(words[start:])
+        if isinstance(index, _CompletionIndex):
+            lo, hi = index.prefix_range(tail)
+            found += [index.display(i) for i in index.top_matches(tail, lo, hi, limit)]
+        else:
+            found += index.suggest(tail, limit)
+        if len(found) >= limit:
+            break
+
+    if len(found) < limit and words[-1]:
+        found += complete(index, words[-1], limit)
+
+    out = []
+    seen = set()
+    for display in found:
+        if display.lower() not in seen:
+            seen.add(display.lower())
+            out.append(display)
+    return out[:limit]
+
+
+class _SuggestCache:
+    """Bounded LRU of suggest results keyed by (profile, prefix, limit).
+
+    Each entry carries the generation stamp of its prefix when it was
+    computed and only hits while the stamp is unchanged. Rescoring a term
+    bumps the generations of that term's prefixes (and of its alias keys',
+    which find it too), so other prefixes keep their entries. A phrase
+    ("new y") also shows its shorter tails' results, so its stamp covers
+    theirs. Typo-tolerant prefixes (FUZZY_MIN_PREFIX+ chars) can match terms
+    that don't start with them, so any rescoring also bumps a shared fuzzy
+    generation those entries depend on. Loading a new index bumps the epoch,
+    which invalidates everything.
+    """
+
+    def __init__(self, capacity: int = SUGGEST_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self._prefix_gen = {}
+        self._fuzzy_gen = 0
+        self._epoch = 0
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+
+    def stamp(self, prefix: str) -> tuple:
+        """Generation stamp to store with a result computed from now on."""
+        with self._lock:
+            return self._stamp(prefix)
+
+    def _stamp(self, prefix: str) -> tuple:
+        fuzzy = self._fuzzy_gen if len(prefix) >= FUZZY_MIN_PREFIX else 0
+        gen = self._prefix_gen.get(prefix, 0)
+        pos = prefix.find(' ')
+        while pos >= 0:
+            # Generations only grow, so the sum changes whenever one does.
+            gen += self._prefix_gen.get(prefix[pos + 1:], 0)
+            pos = prefix.find(' ', pos + 1)
+        return self._epoch, gen, fuzzy
+
+    def get(self, profile: str, prefix: str, limit: int) -> Optional[list]:
+        key = (profile, prefix, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == self._stamp(prefix):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return list(entry[1])
+                del self._entries[key]
+                self._stale += 1
+            self._misses += 1
+            return None
+
+    def put(self, profile: str, prefix: str, limit: int, results: list, stamp: tuple):
+        key = (profile, prefix, limit)
+        with self._lock:
+            self._entries[key] = (stamp, list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate_terms(self, terms):
+        """Bump the generation of every prefix of each term and of its alias keys."""
+        with self._lock:
+            for term in terms:
+                for key in [term] + _alias_keys(term):
+                    for n in range(1, len(key) + 1):
+                        p = key[:n]
+                        self._prefix_gen[p] = self._prefix_gen.get(p, 0) + 1
+            self._fuzzy_gen += 1
+
+            # Generations only need to outlive the entries they guard.
+            if len(self._prefix_gen) > 16 * self._capacity:
+                self._invalidate_all_locked()
+
+    def invalidate_all(self):
+        with self._lock:
+            self._invalidate_all_locked()
+
+    def _invalidate_all_locked(self):
+        self._epoch += 1
+        self._prefix_gen.clear()
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'capacity': self._capacity,
+                'hits': self._hits,
+                'misses': self._misses,
+                'stale': self._stale,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+            }
+
+
+_suggest_cache = _SuggestCache()
+
+
+class _SuggestWorker:
+    """Runs suggest lookups on one thread, newest request first and only.
+
+    run() blocks its bridge thread until the lookup is done. Requests carry
+    increasing generations; one still queued when a newer request arrives is
+    dropped unrun, and one in flight sees cancelled() turn True, so the fuzzy
+    walk stops at its next step and the (partial) result is discarded. Their
+    callers get None. supersede() does the same for requests answered without
+    a lookup (cache hits, next-word predictions).
+
+    Callers may pass an order (the tracked word's version, the page's request
+    id) as bridge calls can arrive out of order: a request ordered below the
+    one queued or in flight is the stale one and gets None straight away.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._gen = 0
+        self._running = 0
+        self._running_order = None
+        self._pending = None
+        self._done = {}
+        self._thread = None
+        self._completed = 0
+        self._dropped = 0
+        self._aborted = 0
+
+    def supersede(self, order=None):
+        with self._cond:
+            if not self._newer_in_flight(order):
+                self._gen += 1
+                self._drop_pending()
+
+    def _newer_in_flight(self, order) -> bool:
+        if order is None:
+            return False
+        if self._pending is not None and self._pending[2] is not None and self._pending[2] > order:
+            return True
+        running = self._running_order
+        return running is not None and self._running == self._gen and running > order
+
+    def _drop_pending(self):
+        if self._pending is not None:
+            self._done[self._pending[0]] = (None, None)
+            self._pending = None
+            self._dropped += 1
+            self._cond.notify_all()
+
+    def cancelled(self) -> bool:
+        """True once the lookup running on the worker is no longer the newest request."""
+        return self._running != self._gen
+
+    def run(self, lookup, order=None):
+        """lookup(cancelled) on the worker; its result, or None if a newer request superseded it."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            if self._newer_in_flight(order):
+                self._dropped += 1
+                return None
+            self._gen += 1
+            gen = self._gen
+            self._drop_pending()
+            self._pending = (gen, lookup, order)
+            self._cond.notify_all()
+            while gen not in self._done:
+                self._cond.wait()
+            result, error = self._done.pop(gen)
+        if error is not None:
+            raise error
+        return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'completed': self._completed,
+                'dropped': self._dropped,
+                'aborted': self._aborted,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                gen, lookup, self._running_order = self._pending
+                self._pending = None
+                self._running = gen
+
+            result = error = None
+            try:
+                result = lookup(self.cancelled)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                if gen != self._gen:
+                    result = error = None
+                    self._aborted += 1
+                else:
+                    self._completed += 1
+                self._running_order = None
+                self._done[gen] = (result, error)
+                self._cond.notify_all()
+
+
+_suggest_worker = _SuggestWorker()
+
+
+class _LayeredIndex:
+    """Several _CompletionIndex layers queried as one, used while the dictionary loads.
+
+    Each layer answers its own exact top-k; results are merged by term, keeping
+    the best score and the display form of the first layer holding the term.
+    Typo tolerance and session narrowing only apply to the final single index.
+    """
+
+    def __init__(self, layers: list):
+        self.layers = layers
+
+    def __len__(self) -> int:
+        return sum(len(layer) for layer in self.layers)
+
+    def set_usage(self, term: str, count: int) -> bool:
+        found = False
+        for layer in self.layers:
+            found = layer.set_usage(term, count) or found
+        return found
+
+    def suggest(self, prefix: str, limit: int) -> list:
+        best = {}
+        for layer in self.layers:
+            lo, hi = layer.prefix_range(prefix)
+            for i in layer.top_matches(prefix, lo, hi, limit):
+                term = layer.words[i]
+                score = layer.score(i)
+                prev = best.get(term)
+                if prev is None:
+                    best[term] = (score, layer.display(i))
+                elif score > prev[0]:
+                    best[term] = (score, prev[1])
+
+        ranked = sorted(best.items(), key=lambda t: (-t[1][0], t[0]))
+        return [display for _, (_, display) in ranked[:limit]]
+
+
+class _OverlayIndex:
+    """A _CompletionIndex with hot-reloaded edits on top.
+
+    Changed terms are hidden in the base and served from a small delta index
+    (removed terms are only hidden), so an edit goes live without touching the
+    base. The watcher swaps in a merged single index shortly afterwards.
+    """
+
+    def __init__(self, base: '_CompletionIndex', changes: dict):
+        self.base = base
+        self.changes = changes
+
+        live = {t: e for t, e in changes.items() if e is not None}
+        self.delta = _build_index({t: w for t, (w, _) in live.items()},
+                                  {t: d for t, (_, d) in live.items() if d != t})
+
+        size = len(base)
+        for term, e in changes.items():
+            indexed = base.find(term) >= 0
+            if e is None and indexed:
+                size -= 1
+            elif e is not None and not indexed:
+                size += 1
+        self._len = size
+
+    def __len__(self) -> int:
+        return self._len
+
+    def entry(self, term: str):
+        if term in self.changes:
+            return self.changes[term]
+        return self.base.entry(term)
+
+    def items(self):
+        changes = self.changes
+        kept = (item for item in self.base.items() if item[0] not in changes)
+        return heapq.merge(kept, self.delta.items())
+
+    def set_usage(self, term: str, count: int) -> bool:
+        in_base = self.base.set_usage(term, count) and term not in self.changes
+        return self.delta.set_usage(term, count) or in_base
+
+    def suggest(self, prefix: str, limit: int) -> list:
+        base = self.base
+        lo, hi = base.prefix_range(prefix)
+        k = limit
+        while True:
+            ids = base.top_matches(prefix, lo, hi, k)
+            kept = [i for i in ids if base.words[i] not in self.changes]
+            if len(kept) >= limit or len(ids) < k:
+                break
+            k *= 2
+
+        found = [(base.score(i), base.words[i], base.display(i)) for i in kept[:limit]]
+        delta = self.delta
+        lo, hi = delta.prefix_range(prefix)
+        found += [(delta.score(i), delta.words[i], delta.display(i)) for i in delta.top_matches(prefix, lo, hi, limit)]
+
+        found.sort(key=lambda t: (-t[0], t[1]))
+        return [display for _, _, display in found[:limit]]
+
+
+_status_lock = threading.Lock()
+_dictionary_status = {'profile': DEFAULT_PROFILE, 'state': 'idle', 'stage': None, 'progress': 0.0, 'terms': 0}
+
+
+def _set_dictionary_status(**changes):
+    with _status_lock:
+        _dictionary_status.update(changes)
+
+
+def _publish_word_index(index, replaces=None, profile: Optional[str] = None, changed=None,
+                        fresh=None) -> bool:
+    """Apply learned usage to index (or its fresh parts only) and make it the live index."""
+    global _word_index
+
+    evicted = []
+    try:
+        # One hold of the lock, so no record_usage slips in between the two steps.
+        with _usage_lock:
+            active = profile is None or profile == _active_profile
+            # Never publish over an index that is no longer live.
+            if replaces is not None and (not active or _word_index is not replaces):
+                return False
+
+            for part in (index,) if fresh is None else fresh:
+                for term, count in _usage.items():
+                    part.set_usage(term, count)
+
+            if not isinstance(index, _LayeredIndex):
+                evicted = _profile_indexes.put(profile or _active_profile, index, _active_profile)
+            if not active:
+                return False
+
+            with _words_lock:
+                _word_index = index
+    finally:
+        _forget_profiles(evicted)
+
+    _startup.mark('first_index')
+    if changed is None:
+        _suggest_cache.invalidate_all()
+    elif changed:
+        _suggest_cache.invalidate_terms(changed)
+    _set_dictionary_status(terms=len(index))
+    return True
+
+
+def _forget_profiles(profiles: list):
+    # Never under _usage_lock: poll waits for it while holding the watcher lock.
+    for name in profiles:
+        _wordlist_watcher.forget(name)
+
+
+def _activate_profile(profile: str) -> bool:
+    """Make profile active; True if its index was already loaded and is now live.
+
+    A loaded index already carries every usage update (record_usage rescoring
+    all of them), so switching back to it is only a pointer swap.
+    """
+    global _word_index, _active_profile
+
+    with _usage_lock:
+        index, evicted = _profile_indexes.activate(profile)
+        with _words_lock:
+            _active_profile = profile
+            _word_index = index
+    _forget_profiles(evicted)
+
+    _suggest_session.reset()
+    if index is None:
+        _set_dictionary_status(profile=profile, state='loading', stage=None, progress=0.0, terms=0)
+        return False
+
+    _set_dictionary_status(profile=profile, state='ready', stage=None, progress=1.0, terms=len(index))
+    return True
+
+
+def _index_nbytes(index) -> int:
+    """Approximate memory held by an index, for PROFILE_MEMORY_CAP_MB."""
+    if isinstance(index, _OverlayIndex):
+        return _index_nbytes(index.base) + _index_nbytes(index.delta)
+
+    def nbytes(buf) -> int:
+        return len(buf) * getattr(buf, 'itemsize', 1)
+
+    words = index.words
+    if isinstance(words, _PackedTerms):
+        size = nbytes(words.blob) + nbytes(words.offsets)
+    else:
+        size = sum(len(w) + 49 for w in words) + 8 * len(words)
+    size += nbytes(index._base) + nbytes(index._scores) + nbytes(index._tree)
+    size += sum(len(t) + len(d) + 160 for t, d in index.display_map.items())
+    if index.aliases is not None:
+        size += _index_nbytes(index.aliases) + nbytes(index._alias_owner)
+    return size
+
+
+def _profile_memory_cap() -> int:
+    mb = _config.get('profile_memory_mb')
+    if not isinstance(mb, (int, float)) or mb <= 0:
+        mb = PROFILE_MEMORY_CAP_MB
+    return int(mb * (1 << 20))
+
+
+class _ProfileIndexes:
+    """Loaded profile indexes, least recently used first.
+
+    Inactive indexes are evicted oldest first while all of them together
+    exceed the memory cap; the active profile's index always stays.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def activate(self, profile: str) -> tuple:
+        """Return (profile's index or None, evicted profiles) and mark it most recently used."""
+        cap = _profile_memory_cap()
+        with self._lock:
+            entry = self._entries.get(profile)
+            if entry is None:
+                return None, []
+            self._entries.move_to_end(profile)
+            return entry[0], self._evict(cap, profile)
+
+    def put(self, profile: str, index, active: str) -> list:
+        """Keep index for profile; returns the profiles evicted to make room."""
+        cap = _profile_memory_cap()
+        with self._lock:
+            self._entries[profile] = (index, _index_nbytes(index))
+            self._entries.move_to_end(profile)
+            return self._evict(cap, active)
+
+    def _evict(self, cap: int, active: str) -> list:
+        evicted = []
+        total = sum(size for _, size in self._entries.values())
+        for name in list(self._entries):
+            if total <= cap:
+                break
+            if name != active:
+                total -= self._entries.pop(name)[1]
+                evicted.append(name)
+        return evicted
+
+    def indexes(self) -> list:
+        with self._lock:
+            return [index for index, _ in self._entries.values()]
+
+    def stats(self) -> list:
+        with self._lock:
+            return [{'profile': name, 'bytes': size} for name, (_, size) in self._entries.items()]
+
+
+_profile_indexes = _ProfileIndexes()
+_profile_loads_lock = threading.Lock()
+_profile_loads = set()
+
+
+def _load_profile_async(profile: str):
+    """Load profile's index in the background unless a load is already running."""
+    with _profile_loads_lock:
+        if profile in _profile_loads:
+            return
+        _profile_loads.add(profile)
+
+    def run():
+        try:
+            _init_wordlist_background(profile)
+        finally:
+            with _profile_loads_lock:
+                _profile_loads.discard(profile)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _build_index(freqs: dict, display_map: dict) -> '_CompletionIndex':
+    terms, weights = _pack_terms(freqs)
+    return _CompletionIndex(terms, weights, display_map)
+
+
+def _init_wordlist_background(profile: Optional[str] = None):
+    if profile is None:
+        profile = _active_profile
+
+    def set_status(**changes):
+        # A profile switched away from keeps loading into _profile_indexes,
+        # but no longer reports.
+        if profile == _active_profile:
+            _set_dictionary_status(profile=profile, **changes)
+
+    set_status(state='loading', stage='cache', progress=0.0)
+
+    sources = _wordlist_sources(profile)
+    base_path = sources[0][1]
+    index = None
+    if not base_path or os.path.exists(base_path):
+        with _metrics.timer('stage.load_compiled_wordlist'):
+            index = _load_compiled_wordlist(sources, profile)
+
+    fingerprints = None
+    if index is None:
+        # The cache covers the bundled extras too, so they are only copied
+        # (back) into place when it misses.
+        set_status(stage='extras')
+        if profile == DEFAULT_PROFILE:
+            try:
+                _copy_bundled_wordlist_extras_if_missing()
+            except Exception:
+                pass
+
+        # Small dictionaries and learned terms first, so typing gets
+        # suggestions while the base list downloads and loads.
+        _usage_ready.wait()
+        with _usage_lock:
+            learned = list(_usage)
+        try:
+            terms, weights, display_map = _load_wordlist(include_base=False, seed_terms=learned, profile=profile)
+        except Exception:
+            terms, weights, display_map = _pack_terms({}) + ({},)
+
+        layers = [_CompletionIndex(terms, weights, display_map)]
+        live = _publish_word_index(_LayeredIndex(list(layers)), profile=profile)
+
+        # On first run the base list is parsed while it downloads, in one pass.
+        base_chunks = None
+        if base_path == _wordlist_path(WORDLIST_FILENAME) and not os.path.exists(base_path):
+            base_chunks = _stream_wordlist_download()
+
+        # Fingerprint before parsing so an edit made mid-load invalidates the cache.
+        try:
+            fingerprints = _fingerprint_sources(sources)
+        except Exception:
+            fingerprints = None
+
+        def on_chunk(chunk: dict, progress: float):
+            nonlocal live
+            # While live, the earlier layers get every usage update already.
+            layers.append(_build_index(chunk, {}))
+            live = _publish_word_index(_LayeredIndex(list(layers)), profile=profile,
+                                       fresh=layers[-1:] if live else None)
+            set_status(progress=progress)
+
+        set_status(stage='base' if base_chunks is None else 'download')
+        stage = 'stage.load_wordlist' if base_chunks is None else 'stage.download_and_load_wordlist'
+        try:
+            with _metrics.timer(stage):
+                terms, weights, display_map = _load_wordlist(on_chunk=on_chunk, base_chunks=base_chunks,
+                                                             profile=profile)
+        except Exception:
+            # A failed or corrupt download: serve the extras for now. A partial
+            # download resumes on the next start; nothing is cached meanwhile.
+            fingerprints = None
+            try:
+                terms, weights, display_map = _load_wordlist(include_base=False, profile=profile)
+            except Exception:
+                terms, weights, display_map = _pack_terms({}) + ({},)
+
+        if base_chunks is not None and fingerprints is not None:
+            try:
+                fingerprints.update(_fingerprint_sources(sources[:1]))
+            except Exception:
+                fingerprints = None
+
+        set_status(stage='index', progress=1.0)
+        with _metrics.timer('stage.build_index'):
+            index = _CompletionIndex(terms, weights, display_map)
+
+    _publish_word_index(index, profile=profile)
+    set_status(state='ready', stage=None, progress=1.0, terms=len(index))
+    _startup.mark('dictionary_ready')
+
+    try:
+        index.warm_children()
     except Exception:
         pass
 
+    if fingerprints is not None and len(index):
+        try:
+            with _metrics.timer('stage.save_compiled_wordlist'):
+                _save_compiled_wordlist(index, fingerprints, profile)
+        except Exception:
+            pass
+
     try:
-        words, freqs, display_map = _load_wordlist()
+        _wordlist_watcher.reset(fingerprints, profile)
     except Exception:
-        words, freqs, display_map = [], {}, {}
+        pass
+
 
-    with _words_lock:
-        _words = words
-        _base_freq = freqs
-        _display_map = display_map
+def _stat_source(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _parse_wordlist_data(data: bytes, with_display: bool = True) -> dict:
+    """term -> summed weight for one word list file's contents.
+
+    With with_display the values are (weight, displays) instead, displays
+    being every spelling of the term in file order.
+    """
+    out = {}
+    for line, _ in _iter_lines([(data, 1.0)]):
+        parsed = _parse_term_line(line)
+        if not parsed:
+            continue
+
+        term, display, freq = parsed
+        if with_display:
+            prev = out.get(term)
+            out[term] = (freq, (display,)) if prev is None else (prev[0] + freq, prev[1] + (display,))
+        else:
+            out[term] = out.get(term, 0) + freq
+    return out
+
+
+def _merge_indexes(index) -> '_CompletionIndex':
+    """Flatten an _OverlayIndex (or anything with items()) into one _CompletionIndex."""
+    blob = bytearray()
+    offsets = array('I', [0])
+    weights = array('I')
+    display_map = {}
+    for term, weight, display in index.items():
+        blob += term.encode('utf-8')
+        offsets.append(len(blob))
+        weights.append(weight)
+        if display != term:
+            display_map[term] = display
+    return _CompletionIndex(_PackedTerms(bytes(blob), offsets), weights, display_map)
+
+
+class _WordlistWatcher:
+    """Polls the active profile's word lists and publishes only the terms an edit changed.
+
+    The first change per profile reloads it in full; later ones are diffed against kept parses.
+    """
+
+    def __init__(self):
+        # Reentrant: a publish from poll can evict, and so forget, a profile.
+        self._lock = threading.RLock()
+        self._states = {}
+        self._sources = []
+        self._stats = None
+        self._fingerprints = {}
+        self._parses = {}
+
+    def reset(self, fingerprints: Optional[dict] = None, profile: str = DEFAULT_PROFILE):
+        """Take the files on disk as the ones profile's index was built from."""
+        sources = _wordlist_sources(profile)
+        if fingerprints is None:
+            fingerprints = _fingerprint_sources(sources)
+
+        with self._lock:
+            self._states[profile] = self._new_state(sources, fingerprints, None)
+
+    def forget(self, profile: str):
+        """Drop profile's state; its next load starts over from the files on disk."""
+        with self._lock:
+            self._states.pop(profile, None)
+
+    @staticmethod
+    def _new_state(sources: list, fingerprints: dict, parses: Optional[dict]) -> tuple:
+        stats = {}
+        for key, path in sources:
+            fp = fingerprints.get(key)
+            stats[key] = None if fp is None else (fp['size'], fp['mtime_ns'])
+        return sources, stats, dict(fingerprints), parses
+
+    def _select(self, profile: str) -> bool:
+        state = self._states.get(profile)
+        if state is None:
+            return False
+        self._sources, self._stats, self._fingerprints, self._parses = state
+        return True
 
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(WORDLIST_WATCH_INTERVAL_S)
+            try:
+                self.poll()
+            except Exception:
+                pass
+
+    @_timed('stage.watch_wordlists')
+    def poll(self) -> bool:
+        """Apply any changed word list files; True if the index changed."""
+        with self._lock:
+            with _words_lock:
+                current = _word_index
+                profile = _active_profile
+            if not isinstance(current, (_CompletionIndex, _OverlayIndex)) or not self._select(profile):
+                return False
+
+            changes = {}
+            for key, path in self._sources:
+                stat = _stat_source(path)
+                if stat == self._stats.get(key):
+                    continue
+                if self._parses is None:
+                    return self._reload(current, profile)
+
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    data = b''
+                    stat = None
+
+                self._stats[key] = stat
+                self._fingerprints[key] = None if stat is None else {
+                    'size': stat[0], 'mtime_ns': stat[1], 'sha256': hashlib.sha256(data).hexdigest(),
+                }
+                self._diff(key, data, current, changes)
+
+            changes = {t: e for t, e in changes.items() if e != current.entry(t)}
+            if not changes:
+                return False
+
+            if isinstance(current, _OverlayIndex):
+                base = current.base
+                merged = dict(current.changes)
+                merged.update(changes)
+            else:
+                base = current
+                merged = changes
+
+            overlay = _OverlayIndex(base, merged)
+            if not _publish_word_index(overlay, replaces=current, profile=profile, changed=changes):
+                return False
+
+            index = _merge_indexes(overlay)
+            if not _publish_word_index(index, replaces=overlay, profile=profile, changed=()):
+                return True
+
+            try:
+                index.warm_children()
+                _save_compiled_wordlist(index, self._fingerprints, profile)
+            except Exception:
+                pass
+            return True
+
+    def _reload(self, current, profile: str) -> bool:
+        """Rebuild profile's index from every list and keep the non-base parses."""
+        sources = self._sources
+        fingerprints = _fingerprint_sources(sources)
+        terms, weights, display_map = _load_wordlist(profile=profile)
+
+        parses = {}
+        for key, path in sources:
+            if key == 'base':
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    parses[key] = _parse_wordlist_data(f.read())
+            except OSError:
+                parses[key] = {}
+
+        self._states[profile] = self._new_state(sources, fingerprints, parses)
+        self._select(profile)
+
+        index = _CompletionIndex(terms, weights, display_map)
+        if not _publish_word_index(index, replaces=current, profile=profile):
+            return False
+
+        try:
+            index.warm_children()
+            _save_compiled_wordlist(index, fingerprints, profile)
+        except Exception:
+            pass
+        return True
 
-def _load_config() -> dict:
-    path = _config_path()
+    def _user_weight(self, term: str) -> int:
+        total = 0
+        for key, parsed in self._parses.items():
+            if key.startswith('user:'):
+                e = parsed.get(term)
+                if e is not None:
+                    total += e[0]
+        return total
+
+    def _term_state(self, term: str, base_weight: int):
+        """(weight, display) for term as a full reload would build it, or None."""
+        weight = base_weight
+        user = []
+        bundled = []
+        for key, _ in self._sources:
+            e = self._parses.get(key, {}).get(term)
+            if e is None:
+                continue
+            if key.startswith('user:'):
+                weight += e[0]
+                user.extend(e[1])
+            elif key.startswith('bundled:'):
+                bundled.extend(e[1])
+
+        if not weight:
+            return None
+
+        in_base = base_weight > 0
+        english = in_base and ' ' not in term
+        display = term if in_base else None
+        for d in bundled:
+            display = _merge_display(term, display, d, 'bundled', english)
+        for d in user:
+            display = _merge_display(term, display or term, d, 'user', english)
+        return min(weight, 0xFFFFFFFF), display
+
+    def _diff(self, key: str, data: bytes, index, changes: dict):
+        """Record the new state of every term whose entry key's new contents affect."""
+        # words.txt is not kept in memory: its weights are the index's minus the user lists'.
+        def base_weight(term: str, entry) -> int:
+            return 0 if entry is None else entry[0] - self._user_weight(term)
+
+        if key == 'base':
+            fresh = _parse_wordlist_data(data, with_display=False)
+            for term, weight, display in index.items():
+                old = base_weight(term, (weight, display))
+                new = fresh.pop(term, 0)
+                if old != new:
+                    changes[term] = self._term_state(term, new)
+            for term, new in fresh.items():
+                changes[term] = self._term_state(term, new)
+            return
+
+        old = self._parses.get(key, {})
+        fresh = _parse_wordlist_data(data)
+        affected = [t for t in old.keys() | fresh.keys() if old.get(t) != fresh.get(t)]
+
+        # Base weights come from the index, so read them before the new parse
+        # changes what the user lists contribute.
+        bases = {}
+        for term in affected:
+            entry = changes[term] if term in changes else index.entry(term)
+            bases[term] = base_weight(term, entry)
+
+        self._parses[key] = fresh
+        for term in affected:
+            changes[term] = self._term_state(term, bases[term])
+
+
+_wordlist_watcher = _WordlistWatcher()
+
+
+_CONFIG_DELETED = object()
+
+
+class _ConfigStore:
+    """config.json held in memory.
+
+    Reads are served from the cached document and reload it only when the
+    file's (size, mtime) changed underneath us. Writes update the cache and
+    mark their top-level key dirty; one timer per CONFIG_WRITE_DELAY_S folds
+    every dirty key into a single atomic replace, re-reading the file first
+    so keys edited externally in the meantime survive.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data: Optional[dict] = None
+        self._stat = None
+        self._dirty = {}
+        self._timer: Optional[threading.Timer] = None
+
+    def _read(self):
+        path = _config_path()
+        stat = _stat_source(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except (OSError, ValueError):
+            # Half-written or hand-broken file: keep what we have until it changes again.
+            self._stat = stat
+            if self._data is None:
+                self._data = {}
+            return
+        if not isinstance(data, dict):
+            data = {}
+
+        for key, value in self._dirty.items():
+            if value is _CONFIG_DELETED:
+                data.pop(key, None)
+            else:
+                data[key] = value
+        self._data = data
+        self._stat = stat
+
+    def _current(self) -> dict:
+        if self._data is None or _stat_source(_config_path()) != self._stat:
+            self._read()
+        return self._data
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            value = self._current().get(key, default)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value):
+        value = copy.deepcopy(value)
+        with self._lock:
+            data = self._current()
+            if key in data and data[key] == value:
+                return
+            data[key] = value
+            self._dirty[key] = value
+            self._schedule()
+
+    def delete(self, *keys: str):
+        with self._lock:
+            data = self._current()
+            for key in keys:
+                if key in data:
+                    del data[key]
+                    self._dirty[key] = _CONFIG_DELETED
+            if self._dirty:
+                self._schedule()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(CONFIG_WRITE_DELAY_S, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @_timed('config.flush')
+    def flush(self):
+        """Write pending changes now; registered with atexit."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+
+            path = _config_path()
+            if _stat_source(path) != self._stat:
+                self._read()
+
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+            self._stat = _stat_source(path)
+            self._dirty = {}
+
+
+_config = _ConfigStore()
+atexit.register(_config.flush)
+
+
+_USAGE_MAGIC = b'HXKUS\x00\x00\x01'
+_USAGE_HEADER = struct.Struct('<8sdI16s')
+_USAGE_ENTRY = struct.Struct('<dH')
+_USAGE_DECAY_RATE = math.log(2) / (USAGE_HALF_LIFE_DAYS * 86400)
+
+
+class _UsageModel:
+    """Bounded usage counts with exponential time decay.
+
+    Holds at most USAGE_MAX_TERMS terms; when a new term arrives at the cap,
+    the weakest tenth is dropped. Each use counts 1 and halves in weight every
+    USAGE_HALF_LIFE_DAYS. Decay is applied forward: a use at time t adds
+    exp(rate * (t - landmark)), so stored values never change as time passes
+    and a term's current value is one multiplication away.
+
+    Not thread-safe; callers hold _usage_lock.
+    """
+
+    def __init__(self, landmark: Optional[float] = None):
+        self._landmark = time.time() if landmark is None else landmark
+        self._stored = {}
+
+    def __len__(self) -> int:
+        return len(self._stored)
+
+    def __iter__(self):
+        return iter(self._stored)
+
+    def __contains__(self, term) -> bool:
+        return term in self._stored
+
+    def _scale(self, when: float) -> float:
+        return math.exp(_USAGE_DECAY_RATE * (when - self._landmark))
+
+    def value(self, term: str, now: Optional[float] = None) -> float:
+        stored = self._stored.get(term)
+        if stored is None:
+            return 0.0
+        return stored / self._scale(time.time() if now is None else now)
+
+    def items(self, now: Optional[float] = None):
+        """Yield (term, decayed count) as of now."""
+        factor = 1.0 / self._scale(time.time() if now is None else now)
+        for term, stored in self._stored.items():
+            yield term, stored * factor
+
+    def add(self, term: str, delta: float = 1.0, when: Optional[float] = None):
+        """Count delta uses of term at when (default now); return (value, evicted terms)."""
+        now = time.time()
+        if when is None:
+            when = now
+
+        # Keep the stored magnitudes bounded over very long runs.
+        if _USAGE_DECAY_RATE * (now - self._landmark) > 20:
+            factor = 1.0 / self._scale(now)
+            self._stored = {t: v * factor for t, v in self._stored.items()}
+            self._landmark = now
+
+        evicted = []
+        if term not in self._stored and len(self._stored) >= USAGE_MAX_TERMS:
+            ranked = sorted(self._stored, key=self._stored.get, reverse=True)
+            keep = USAGE_MAX_TERMS * 9 // 10
+            evicted = ranked[keep:]
+            for t in evicted:
+                del self._stored[t]
+
+        self._stored[term] = self._stored.get(term, 0.0) + delta * self._scale(when)
+        return self.value(term, now), evicted
+
+    def copy(self) -> '_UsageModel':
+        other = _UsageModel(self._landmark)
+        other._stored = dict(self._stored)
+        return other
+
+    def to_bytes(self, journal_id: str) -> bytes:
+        now = time.time()
+        parts = [_USAGE_HEADER.pack(_USAGE_MAGIC, now, len(self._stored), journal_id.encode('ascii'))]
+        for term, value in self.items(now):
+            raw = term.encode('utf-8')
+            parts.append(_USAGE_ENTRY.pack(value, len(raw)))
+            parts.append(raw)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """Return (model, journal_id); raises ValueError for a damaged file."""
+        try:
+            magic, saved_at, count, journal_id = _USAGE_HEADER.unpack_from(data, 0)
+            if magic != _USAGE_MAGIC:
+                raise ValueError('not a usage file')
+
+            model = cls(saved_at)
+            pos = _USAGE_HEADER.size
+            for _ in range(count):
+                value, size = _USAGE_ENTRY.unpack_from(data, pos)
+                pos += _USAGE_ENTRY.size
+                model._stored[str(data[pos:pos + size], 'utf-8')] = value
+                pos += size
+            return model, journal_id.decode('ascii')
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError('damaged usage file') from e
+
+
+# Replaced by the persisted model in _init_usage_background; guarded by _usage_lock.
+_usage = _UsageModel()
+# Cleared while that load runs.
+_usage_ready = threading.Event()
+_usage_ready.set()
+
+
+def _usage_path() -> str:
+    return os.path.join(_config_dir(), USAGE_FILENAME)
+
+
+def _usage_journal_path() -> str:
+    return os.path.join(_config_dir(), USAGE_JOURNAL_FILENAME)
+
+
+def _read_usage_journal(journal_id: Optional[str]) -> list:
+    """Return the (term, delta, when) entries appended since the compaction tagged journal_id."""
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data if isinstance(data, dict) else {}
-    except FileNotFoundError:
-        return {}
+        with open(_usage_journal_path(), 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+    except (FileNotFoundError, UnicodeDecodeError):
+        return []
+
+    # The journal starts with the id of the compaction it follows. A mismatch
+    # means usage.bin was written but the journal not yet rotated (crash
+    # mid-compaction): its entries are already folded into usage.bin.
+    if not journal_id or not lines or lines[0] != '#' + journal_id:
+        return []
+
+    # The last element is '' for a cleanly terminated file, or a torn write.
+    # Lines from before usage decay have no timestamp; they count as now.
+    now = time.time()
+    entries = []
+    for line in lines[1:-1]:
+        parts = line.split('\t')
+        if len(parts) not in (2, 3) or not parts[0]:
+            continue
+        try:
+            when = float(parts[2]) if len(parts) == 3 else now
+            entries.append((parts[0], float(parts[1]), when))
+        except ValueError:
+            continue
+    return entries
+
 
+def _load_usage():
+    """Return (_UsageModel, journal_id, replayed_entries) from usage.bin plus the journal.
 
-def _save_config(data: dict):
-    path = _config_path()
+    Without a usage.bin, the counts of older versions (config.json "usage")
+    are imported as if used once each today.
+    """
+    model = None
+    journal_id = None
+    try:
+        with open(_usage_path(), 'rb') as f:
+            model, journal_id = _UsageModel.from_bytes(f.read())
+    except (OSError, ValueError):
+        pass
+
+    if model is None:
+        raw = _config.get('usage')
+        journal_id = _config.get('usage_journal')
+
+        model = _UsageModel()
+        if isinstance(raw, dict):
+            counts = [(k, v) for k, v in raw.items() if isinstance(k, str) and isinstance(v, (int, float))]
+            counts.sort(key=lambda t: t[1], reverse=True)
+            for term, count in counts[:USAGE_MAX_TERMS]:
+                model.add(term, float(count))
+
+    if not isinstance(journal_id, str):
+        journal_id = None
+
+    entries = _read_usage_journal(journal_id)
+    for term, delta, when in entries:
+        model.add(term, delta, when)
+
+    return model, journal_id, len(entries)
+
+
+def _save_usage(usage: '_UsageModel', journal_id: str):
+    path = _usage_path()
     tmp = path + '.tmp'
-    with open(tmp, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(tmp, 'wb') as f:
+        f.write(usage.to_bytes(journal_id))
     os.replace(tmp, path)
 
+    # usage.bin supersedes the counts older versions kept in config.json.
+    _config.delete('usage', 'usage_journal')
 
-def _load_usage() -> dict:
-    with _config_lock:
-        data = _load_config()
-        raw = data.get('usage')
 
-    if not isinstance(raw, dict):
-        return {}
+def _rescore_usage():
+    """Rescore learned terms in every loaded index for their decayed counts."""
+    with _usage_lock:
+        values = list(_usage.items())
+        with _words_lock:
+            live = _word_index
+        indexes = _profile_indexes.indexes()
+        if live is not None and live not in indexes:
+            indexes.append(live)
 
-    cleaned = {}
-    for k, v in raw.items():
-        if not isinstance(k, str):
-            continue
-        if not isinstance(v, (int, float)):
-            continue
-        cleaned[k] = int(v)
+        for index in indexes:
+            for term, value in values:
+                index.set_usage(term, value)
 
-    return cleaned
+    _suggest_cache.invalidate_all()
 
 
-def _save_usage(usage: dict):
-    with _config_lock:
-        data = _load_config()
-        data['usage'] = usage
-        _save_config(data)
+def _usage_rescorer():
+    while True:
+        time.sleep(USAGE_RESCORE_INTERVAL_S)
+        try:
+            _rescore_usage()
+        except Exception:
+            pass
+
+
+class _UsageJournal:
+    """Write-behind, append-only log of usage increments.
+
+    record_usage only queues an increment; a background thread appends queued
+    increments (with their time, for decay) to the journal every
+    USAGE_FLUSH_INTERVAL_S or USAGE_FLUSH_BATCH entries, and folds the journal
+    into usage.bin once it holds USAGE_COMPACT_ENTRIES lines.
+
+    Lock order: _file_lock -> _usage_lock -> _pending_lock.
+    """
+
+    def __init__(self):
+        self._file_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = {}
+        self._pending_count = 0
+        self._journal_id = None
+        self._journal_entries = 0
+        self._thread = None
+        self._closed = False
+
+    def start(self, journal_id: Optional[str], replayed: int):
+        self._journal_id = journal_id
+        self._journal_entries = replayed
+
+        # Fold anything replayed from a previous run (or counts migrated from
+        # config.json) into usage.bin so this run starts on an empty journal.
+        if (replayed or not journal_id or not os.path.exists(_usage_journal_path())
+                or not os.path.exists(_usage_path())):
+            try:
+                self.compact()
+            except Exception:
+                pass
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, term: str, delta: int = 1):
+        """Queue an increment. Caller holds _usage_lock and has already applied it to _usage."""
+        with self._pending_lock:
+            prev = self._pending.get(term)
+            self._pending[term] = (delta if prev is None else prev[0] + delta, time.time())
+            self._pending_count += 1
+            full = self._pending_count >= USAGE_FLUSH_BATCH
+
+        if full:
+            self._wake.set()
+
+    def pending(self) -> dict:
+        """term -> (delta, when) queued but not yet written."""
+        with self._pending_lock:
+            return dict(self._pending)
+
+    def _take_pending(self) -> dict:
+        with self._pending_lock:
+            batch = self._pending
+            self._pending = {}
+            self._pending_count = 0
+        return batch
+
+    @_timed('usage.flush')
+    def flush(self):
+        with self._file_lock:
+            batch = self._take_pending()
+            if batch and self._journal_id:
+                lines = ''.join(f'{term}\t{delta:g}\t{when:.0f}\n' for term, (delta, when) in batch.items())
+                with open(_usage_journal_path(), 'a', encoding='utf-8') as f:
+                    f.write(lines)
+                self._journal_entries += len(batch)
+            elif batch:
+                # No journal yet (the startup compaction failed): fall back to a
+                # full write, which also creates the journal.
+                self._compact_locked()
+                return
+
+        if self._journal_entries >= USAGE_COMPACT_ENTRIES:
+            self.compact()
+
+    @_timed('usage.compact')
+    def compact(self):
+        with self._file_lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        # Everything queued so far is already counted in _usage, so the snapshot
+        # supersedes both the journal and the pending batch.
+        with _usage_lock:
+            self._take_pending()
+            snapshot = _usage.copy()
+
+        journal_id = os.urandom(8).hex()
+        _save_usage(snapshot, journal_id)
+
+        path = _usage_journal_path()
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write('#' + journal_id + '\n')
+        os.replace(tmp, path)
+
+        self._journal_id = journal_id
+        self._journal_entries = 0
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(USAGE_FLUSH_INTERVAL_S)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def close(self):
+        """Flush queued increments; registered with atexit."""
+        self._closed = True
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+
+_usage_journal = _UsageJournal()
 
 
 def load_macros() -> list:
-    with _config_lock:
-        data = _load_config()
-        raw = data.get('macros')
+    raw = _config.get('macros')
 
     if not isinstance(raw, list):
         return ['' for _ in range(MACRO_COUNT)]
@@ -613,33 +3219,642 @@ def save_macros(macros: list) -> bool:
         v = macros[i] if i < len(macros) else ''
         cleaned.append(v if isinstance(v, str) else '')
 
-    with _config_lock:
-        data = _load_config()
-        data['macros'] = cleaned
-        _save_config(data)
+    _config.set('macros', cleaned)
 
+    try:
+        _compile_macros(cleaned)
+    except Exception:
+        pass
     return True
 
 
-def _on_webview_started():
-    global _usage
+MACRO_PROGRAMS_FILENAME = 'macros.compiled.json'
+# Bumped when templates compile differently, so stale programs are rebuilt.
+MACRO_PROGRAMS_VERSION = 2
+MACRO_MAX_REPEAT = 100
+MACRO_MAX_DELAY_S = 10.0
 
-    with _usage_lock:
-        _usage = _load_usage()
+_MACRO_KEY_ALIASES = {
+    'ctrl': 'Control', 'control': 'Control', 'shift': 'Shift', 'alt': 'Alt',
+    'win': 'Meta', 'meta': 'Meta', 'esc': 'Escape', 'return': 'Enter', 'bs': 'Backspace',
+    'del': 'Delete', 'ins': 'Insert', 'pgup': 'PageUp', 'pgdn': 'PageDown',
+    'left': 'ArrowLeft', 'right': 'ArrowRight', 'up': 'ArrowUp', 'down': 'ArrowDown',
+}
+_MACRO_KEY_NAMES = {name.lower(): name for name in VK_CODES if len(name) > 1}
+_MACRO_TOKEN = re.compile(r'\{\{|\}\}|\{([^{}]+)\}')
+
+_macro_lock = threading.Lock()
+_macro_programs: Optional[dict] = None
+
+
+def _macro_key_name(name: str) -> Optional[str]:
+    """VK_CODES name for a template key name (Ctrl, Tab, a, F5, ...), or None."""
+    lowered = name.strip().lower()
+    if lowered in _MACRO_KEY_ALIASES:
+        return _MACRO_KEY_ALIASES[lowered]
+    if lowered in _MACRO_KEY_NAMES:
+        return _MACRO_KEY_NAMES[lowered]
+    if len(lowered) == 1 and lowered.upper() in VK_CODES:
+        return lowered.upper()
+    return None
+
+
+def _parse_macro_token(body: str):
+    """('key', key, modifiers, count) or ('delay', seconds) for a {...} body, or None."""
+    m = re.fullmatch(r'\s*(.*?)(?:\s+(\d+))?\s*', body)
+    spec, count = m.group(1), m.group(2)
+
+    if spec.lower() in ('delay', 'sleep'):
+        if count is None:
+            return None
+        return 'delay', min(int(count) / 1000.0, MACRO_MAX_DELAY_S)
+
+    # The last part is the key, so '{Ctrl++}' presses Ctrl and '+'.
+    parts = spec.split('+')
+    if spec.endswith('++'):
+        parts = parts[:-2] + ['+']
+    names = [_macro_key_name(p) for p in parts]
+    if not spec or None in names:
+        return None
+
+    modifiers, key = names[:-1], names[-1]
+    if any(m not in ('Control', 'Shift', 'Alt', 'Meta') for m in modifiers):
+        return None
+    # A lone character ('{a}' in '\frac{a}{b}') is text; it needs a modifier to be a key.
+    if len(key) == 1 and not modifiers:
+        return None
+    return 'key', key, modifiers, max(1, min(int(count or 1), MACRO_MAX_REPEAT))
+
+
+def _parse_macro(template: str) -> list:
+    """Split a macro template into ('text', str), ('key', ...) and ('delay', ...) tokens.
+
+    {Enter}, {Ctrl+A}, {Tab 3} (repeat) and {Delay 200} (milliseconds) are
+    special; {{ and }} are literal braces, and a {...} that names no key, or
+    only a single character without modifiers, is typed as it is.
+    """
+    tokens = []
+    text = []
+    pos = 0
+    for m in _MACRO_TOKEN.finditer(template):
+        text.append(template[pos:m.start()])
+        pos = m.end()
+        if m.group(1) is None:
+            text.append(m.group(0)[0])
+            continue
+
+        token = _parse_macro_token(m.group(1))
+        if token is None:
+            text.append(m.group(0))
+            continue
+        if ''.join(text):
+            tokens.append(('text', ''.join(text)))
+        text = []
+        tokens.append(token)
+
+    text.append(template[pos:])
+    if ''.join(text):
+        tokens.append(('text', ''.join(text)))
+    return tokens
+
+
+def _compile_macro(template: str, backend) -> dict:
+    """Compile a template into {'steps': [...], 'track': [...]}.
+
+    steps are ['keys', events] and ['delay', seconds], with consecutive key
+    events merged so each run between delays is one SendInput batch. track
+    replays the keys to _WordTracker: ['text', str] or ['key', key, modifiers].
+    """
+    layout = backend.keyboard_layout()
+    steps = []
+    track = []
+    for token in _parse_macro(template):
+        if token[0] == 'delay':
+            steps.append(['delay', token[1]])
+            continue
 
-    # Identify our own window handle and start foreground tracking.
-    hwnd = _find_window_by_title(WINDOW_TITLE)
+        if token[0] == 'text':
+            events = _compile_text(token[1], backend)
+            track.append(['text', token[1]])
+        else:
+            _, key, modifiers, count = token
+            mod_vks = [VK_CODES[m] for m in modifiers]
+            vk = VK_CODES[key]
+            if len(key) == 1 and not key.isalnum():
+                # Punctuation is the character, so {Ctrl++} adds the Shift that '+' needs.
+                vk_scan = _vk_scan(backend, key, layout)
+                if vk_scan != -1:
+                    vk = vk_scan & 0xFF
+                    shift_state = (vk_scan >> 8) & 0xFF
+                    for bit, name in ((0x01, 'Shift'), (0x02, 'Control'), (0x04, 'Alt')):
+                        if shift_state & bit and VK_CODES[name] not in mod_vks:
+                            mod_vks.append(VK_CODES[name])
+            events = _combo_events(mod_vks, vk) * count
+            track.extend([['key', key, modifiers]] * count)
+
+        events = [list(e) for e in events]
+        if steps and steps[-1][0] == 'keys':
+            steps[-1][1].extend(events)
+        else:
+            steps.append(['keys', events])
+    return {'steps': steps, 'track': track}
+
+
+def _macro_programs_path() -> str:
+    return os.path.join(_config_dir(), MACRO_PROGRAMS_FILENAME)
+
+
+def _compile_macros(macros: list) -> dict:
+    """Compile every macro for the current keyboard layout and cache the result on disk."""
+    global _macro_programs
+
+    backend = _input_backend
+    layout = backend.keyboard_layout()
+    compiled = {
+        'version': MACRO_PROGRAMS_VERSION,
+        'layout': layout,
+        'sources': list(macros),
+        'programs': [_compile_macro(m, backend) for m in macros],
+    }
+
+    with _macro_lock:
+        _macro_programs = compiled
+
+    path = _macro_programs_path()
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(compiled, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return compiled
+
+
+def _macro_program(index: int) -> Optional[dict]:
+    """The compiled program for macro index, recompiling if the macros or the layout changed."""
+    global _macro_programs
+
+    macros = load_macros()
+    layout = _input_backend.keyboard_layout()
+
+    with _macro_lock:
+        compiled = _macro_programs
+    if compiled is None:
+        try:
+            with open(_macro_programs_path(), 'r', encoding='utf-8') as f:
+                compiled = json.load(f)
+        except (OSError, ValueError):
+            compiled = None
+
+    if (not isinstance(compiled, dict) or compiled.get('version') != MACRO_PROGRAMS_VERSION
+            or compiled.get('layout') != layout or compiled.get('sources') != macros):
+        try:
+            compiled = _compile_macros(macros)
+        except OSError:
+            compiled = None
+        if compiled is None:
+            return _compile_macro(macros[index], _input_backend)
+    else:
+        with _macro_lock:
+            _macro_programs = compiled
+
+    return compiled['programs'][index]
+
+
+def _run_macro_steps(steps: list):
+    for step in steps:
+        if step[0] == 'delay':
+            time.sleep(step[1])
+        elif step[1]:
+            _input_backend.send(step[1])
+
+
+class _NgramModel:
+    """Bounded bigram/trigram next-word model keyed by integer word ids.
+
+    Words get 16-bit ids (0 is the sentence start). A bigram context is the
+    previous word's id, a trigram context packs the two previous ids into one
+    int. Each context keeps at most NGRAM_MAX_SUCCESSORS successor counts
+    (space-saving replacement of the smallest), and once there are more than
+    NGRAM_MAX_CONTEXTS contexts the weakest half is dropped and unreferenced
+    word ids are recycled.
+    """
+
+    BOS = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._words = ['']
+        self._free = []
+        self._bigrams = {}
+        self._trigrams = {}
+        self._dirty = False
+        self._full = False
+
+    def _id(self, word: str, create: bool) -> Optional[int]:
+        key = word.lower()
+        i = self._ids.get(key)
+        if i is not None:
+            # Remember the most recent casing for display.
+            if create:
+                self._words[i] = word
+            return i
+        if not create:
+            return None
+
+        if self._free:
+            i = self._free.pop()
+            self._words[i] = word
+        elif len(self._words) < NGRAM_MAX_VOCAB:
+            i = len(self._words)
+            self._words.append(word)
+        else:
+            # Vocabulary full: skip this word; learn() prunes to free ids.
+            self._full = True
+            return None
+
+        self._ids[key] = i
+        return i
+
+    @staticmethod
+    def _bump(table: dict, ctx: int, nxt: int):
+        succ = table.get(ctx)
+        if succ is None:
+            table[ctx] = {nxt: 1}
+            return
+
+        if nxt in succ or len(succ) < NGRAM_MAX_SUCCESSORS:
+            succ[nxt] = succ.get(nxt, 0) + 1
+            return
+
+        victim = min(succ, key=succ.get)
+        floor = succ.pop(victim)
+        succ[nxt] = floor + 1
+
+    def learn(self, context: tuple, word: str):
+        """Count word after context (the previous words, None for a sentence start)."""
+        with self._lock:
+            w = self._id(word, True)
+            ids = [self.BOS if c is None else self._id(c, True) for c in context[-2:]]
+
+            if w is not None and ids and None not in ids:
+                self._bump(self._bigrams, ids[-1], w)
+                if len(ids) == 2:
+                    self._bump(self._trigrams, (ids[0] << 16) | ids[1], w)
+                self._dirty = True
+
+            if self._full or len(self._bigrams) + len(self._trigrams) > NGRAM_MAX_CONTEXTS:
+                self._prune()
+                self._full = False
+
+    def predict(self, context: tuple, k: int) -> list:
+        """Top-k next words after context, trigram counts backed off to bigrams."""
+        with self._lock:
+            ids = [self.BOS if c is None else self._id(c, False) for c in context[-2:]]
+            if not ids or ids[-1] is None:
+                return []
+
+            scored = {}
+            bi = self._bigrams.get(ids[-1])
+            if bi:
+                total = sum(bi.values())
+                for w, n in bi.items():
+                    scored[w] = NGRAM_BACKOFF * n / total
+
+            if len(ids) == 2 and ids[0] is not None:
+                tri = self._trigrams.get((ids[0] << 16) | ids[1])
+                if tri:
+                    total = sum(tri.values())
+                    for w, n in tri.items():
+                        scored[w] = max(scored.get(w, 0.0), n / total)
+
+            best = heapq.nlargest(k, scored.items(), key=lambda t: (t[1], -t[0]))
+            return [self._words[w] for w, _ in best]
+
+    def _prune(self):
+        contexts = [(sum(succ.values()), 0, ctx) for ctx, succ in self._bigrams.items()]
+        contexts += [(sum(succ.values()), 1, ctx) for ctx, succ in self._trigrams.items()]
+        contexts.sort()
+        for _, kind, ctx in contexts[:len(contexts) // 2]:
+            del (self._trigrams if kind else self._bigrams)[ctx]
+
+        used = {self.BOS}
+        for ctx, succ in self._bigrams.items():
+            used.add(ctx)
+            used.update(succ)
+        for ctx, succ in self._trigrams.items():
+            used.add(ctx >> 16)
+            used.add(ctx & 0xFFFF)
+            used.update(succ)
+
+        for i in range(1, len(self._words)):
+            if i not in used and self._words[i]:
+                del self._ids[self._words[i].lower()]
+                self._words[i] = ''
+                self._free.append(i)
+
+    def save(self, path: str):
+        with self._lock:
+            if not self._dirty:
+                return
+
+            blob = bytearray()
+            offsets = array('I', [0])
+            for w in self._words:
+                blob += w.encode('utf-8')
+                offsets.append(len(blob))
+
+            tables = []
+            for table in (self._bigrams, self._trigrams):
+                flat = array('I')
+                for ctx, succ in table.items():
+                    for w, n in succ.items():
+                        flat.extend((ctx, w, n))
+                tables.append(flat)
+            # learn() may add words once the lock is released.
+            header = _NGRAM_HEADER.pack(_NGRAM_MAGIC, len(self._words), len(blob), len(tables[0]), len(tables[1]))
+            self._dirty = False
+
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(header)
+            f.write(offsets.tobytes())
+            f.write(bytes(blob))
+            f.write(tables[0].tobytes())
+            f.write(tables[1].tobytes())
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+
+        try:
+            magic, n_words, blob_len, n_bi, n_tri = _NGRAM_HEADER.unpack_from(data, 0)
+            if magic != _NGRAM_MAGIC:
+                return
+
+            pos = _NGRAM_HEADER.size
+            offsets = array('I')
+            offsets.frombytes(data[pos:pos + 4 * (n_words + 1)])
+            pos += 4 * (n_words + 1)
+            blob = data[pos:pos + blob_len]
+            pos += blob_len
+
+            tables = []
+            for count in (n_bi, n_tri):
+                flat = array('I')
+                flat.frombytes(data[pos:pos + 4 * count])
+                pos += 4 * count
+                table = {}
+                for j in range(0, len(flat) - 2, 3):
+                    table.setdefault(flat[j], {})[flat[j + 1]] = flat[j + 2]
+                tables.append(table)
+
+            words = [str(blob[offsets[i]:offsets[i + 1]], 'utf-8') for i in range(n_words)]
+        except (struct.error, ValueError, IndexError):
+            return
+
+        with self._lock:
+            self._words = words or ['']
+            self._ids = {w.lower(): i for i, w in enumerate(self._words) if i and w}
+            self._free = [i for i, w in enumerate(self._words) if i and not w]
+            self._bigrams, self._trigrams = tables
+            self._dirty = False
+
+
+_NGRAM_MAGIC = b'HXKNG\x00\x00\x01'
+_NGRAM_HEADER = struct.Struct('<8sIIII')
+
+_ngram_model = _NgramModel()
+
+
+def _ngram_path() -> str:
+    return os.path.join(_config_dir(), NGRAM_FILENAME)
+
+
+def _save_ngrams():
+    try:
+        _ngram_model.save(_ngram_path())
+    except Exception:
+        pass
+
+
+def _ngram_saver():
+    while True:
+        time.sleep(NGRAM_SAVE_INTERVAL_S)
+        _save_ngrams()
+
+
+class _WordTracker:
+    """Best-effort reconstruction of the words typed through send_key/send_text.
+
+    Completed words are fed to the n-gram model with the two words before them.
+    Accepted suggestions arrive here too, since the page types them out with
+    send_text. Anything that may move the caret (arrows, shortcuts, backspacing
+    past the current word) forgets the context rather than guess.
+
+    The words typed before the current one, separated by single spaces, form
+    the phrase suggestions are looked up for (see _suggest_phrase); backspace
+    at the start of a word steps back into the phrase's last word. version
+    grows with every change, so the page can order answers about this state.
+    """
+
+    def __init__(self, model: _NgramModel):
+        self._lock = threading.Lock()
+        self._model = model
+        self._word = []
+        self._phrase = []
+        self._context = (None,)
+        self._version = 0
+
+    def context(self) -> tuple:
+        with self._lock:
+            return self._context if not self._word else ()
+
+    def state(self) -> tuple:
+        """(version, current word, phrase head) where the head is the phrase's earlier words plus a space."""
+        with self._lock:
+            head = ''.join(w + ' ' for w in self._phrase)
+            return self._version, ''.join(self._word), head
+
+    def _end_word(self, in_phrase: bool = False):
+        word = ''.join(self._word)
+        if in_phrase and word:
+            self._phrase = (self._phrase + [word])[-(PHRASE_MAX_WORDS - 1):]
+        else:
+            self._phrase = []
+        if not word:
+            return
+        self._word = []
+        self._model.learn(self._context, word)
+        self._context = (self._context + (word,))[-2:]
+
+    def _feed_char(self, ch: str):
+        if ch.isalnum() or (ch in "'-" and self._word):
+            self._word.append(ch)
+        elif ch == '\b':
+            if self._word:
+                self._word.pop()
+            elif self._phrase:
+                self._word = list(self._phrase.pop())
+                self._context = ()
+            else:
+                self._context = ()
+        elif ch in '.!?\n':
+            self._end_word()
+            self._context = (None,)
+        else:
+            self._end_word(ch == ' ')
+
+    def _forget(self):
+        self._word = []
+        self._phrase = []
+        self._context = ()
+
+    def feed_text(self, text: str):
+        with self._lock:
+            self._version += 1
+            for ch in text:
+                self._feed_char(ch)
+
+    def feed_key(self, key: str, modifiers: list):
+        with self._lock:
+            self._version += 1
+            if any(m in ('Control', 'Alt', 'Meta') for m in modifiers):
+                self._forget()
+            elif len(key) == 1:
+                self._feed_char(key if 'Shift' in modifiers else key.lower())
+            elif key in ('Space', 'Tab'):
+                self._end_word(key == 'Space')
+            elif key == 'Enter':
+                self._feed_char('\n')
+            elif key == 'Backspace':
+                self._feed_char('\b')
+            elif key not in ('Shift', 'CapsLock'):
+                self._forget()
+
+
+_word_tracker = _WordTracker(_ngram_model)
+
+
+class _SuggestionPusher:
+    """Pushes suggestions for the tracked word to the page via evaluate_js.
+
+    Used when Python changed the word without the page asking (typed text:
+    macros, accepted suggestions); keystrokes get theirs from
+    send_key_and_suggest directly. Notifications coalesce, and the push runs
+    on its own thread because evaluate_js waits for the page.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._window = None
+        self._api = None
+        self._pending = False
+        self._thread = None
+        self._pushed = 0
+
+    def attach(self, window, api: 'Api'):
+        with self._cond:
+            self._window = window
+            self._api = api
+
+    def run_js(self, script: str):
+        """Run script in the page on a thread of its own, without waiting for the answer."""
+        with self._cond:
+            window = self._window
+        if window is not None:
+            threading.Thread(target=window.evaluate_js, args=(script,), daemon=True).start()
+
+    def notify(self):
+        with self._cond:
+            if self._window is None:
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._pending = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                self._pending = False
+                window, api = self._window, self._api
+
+            try:
+                payload = api.get_tracked_suggestions()
+                window.evaluate_js('window.hexkbdPushSuggestions && window.hexkbdPushSuggestions(%s)'
+                                   % json.dumps(payload, ensure_ascii=False))
+                self._pushed += 1
+            except Exception:
+                pass
+
+
+_suggestion_pusher = _SuggestionPusher()
+
+
+def _init_usage_background():
+    """Load learned usage and the n-gram model, then rescore what already loaded."""
+    global _usage
+
+    try:
+        with _startup.span('usage'):
+            usage, journal_id, replayed = _load_usage()
+            with _usage_lock:
+                # Anything used before this finished is only queued in the journal.
+                for term, (delta, when) in _usage_journal.pending().items():
+                    usage.add(term, delta, when)
+                _usage = usage
+            _usage_journal.start(journal_id, replayed)
+    finally:
+        _usage_ready.set()
+    _rescore_usage()
+
+    threading.Thread(target=_usage_rescorer, daemon=True).start()
+
+    with _startup.span('ngrams'):
+        _ngram_model.load(_ngram_path())
+    threading.Thread(target=_ngram_saver, daemon=True).start()
+    atexit.register(_save_ngrams)
+
+
+def _attach_own_window():
+    """Find our window, hook its resizing and start tracking the target window."""
+    with _startup.span('window_handle'):
+        hwnd = _find_window_by_title(WINDOW_TITLE)
     if hwnd is None:
         hwnd = _get_foreground_hwnd()
     _set_osk_hwnd(hwnd)
 
     _install_aspect_ratio_hook(hwnd)
 
-    t = threading.Thread(target=_track_last_active_window, daemon=True)
-    t.start()
+    threading.Thread(target=_track_last_active_window, daemon=True).start()
+
+
+def _on_webview_started():
+    global _active_profile
 
-    w = threading.Thread(target=_init_wordlist_background, daemon=True)
-    w.start()
+    _startup.mark('webview_started')
+
+    # The dictionary is what makes the keyboard useful, so its load (usually
+    # just mapping wordlist.cache) starts first; usage is applied to it once
+    # loaded, and nothing else has to finish before typing works.
+    profile = _config.get('profile')
+    if profile in _load_profiles():
+        _active_profile = profile
+
+    _usage_ready.clear()
+    _load_profile_async(_active_profile)
+
+    threading.Thread(target=_init_usage_background, daemon=True).start()
+    threading.Thread(target=_attach_own_window, daemon=True).start()
+
+    _wordlist_watcher.start()
 
 
 if hasattr(ctypes.wintypes, 'ULONG_PTR'):
@@ -658,9 +3873,23 @@ class KEYBDINPUT(ctypes.Structure):
     ]
 
 
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ('dx', ctypes.wintypes.LONG),
+        ('dy', ctypes.wintypes.LONG),
+        ('mouseData', ctypes.wintypes.DWORD),
+        ('dwFlags', ctypes.wintypes.DWORD),
+        ('time', ctypes.wintypes.DWORD),
+        ('dwExtraInfo', _ULONG_PTR),
+    ]
+
+
 class _INPUT_UNION(ctypes.Union):
+    # MOUSEINPUT is the largest member; SendInput rejects a cbSize that does
+    # not match the real INPUT size.
     _fields_ = [
         ('ki', KEYBDINPUT),
+        ('mi', MOUSEINPUT),
     ]
 
 
@@ -679,6 +3908,12 @@ if user32:
     user32.VkKeyScanW.argtypes = [ctypes.wintypes.WCHAR]
     user32.VkKeyScanW.restype = ctypes.c_short
 
+    user32.VkKeyScanExW.argtypes = [ctypes.wintypes.WCHAR, ctypes.wintypes.HKL]
+    user32.VkKeyScanExW.restype = ctypes.c_short
+
+    user32.GetKeyboardLayout.argtypes = [ctypes.wintypes.DWORD]
+    user32.GetKeyboardLayout.restype = ctypes.wintypes.HKL
+
 
 def _send_unicode_unit(scan_code: int) -> bool:
     if not user32:
@@ -725,6 +3960,290 @@ def press_combo(modifiers, vk: int):
         user32.keybd_event(mod_vk, 0, KEYEVENTF_KEYUP, 0)
 
 
+def _type_text_unbatched(text: str):
+    """Type text one keybd_event/SendInput call per key (SEND_TEXT_BATCHED off)."""
+    for ch in text:
+        if ch == '\n':
+            press_vk(VK_CODES['Enter'])
+            continue
+        if ch == '\t':
+            press_vk(VK_CODES['Tab'])
+            continue
+        if ch == '\b':
+            press_vk(VK_CODES['Backspace'])
+            continue
+
+        if ch == ' ':
+            press_vk(VK_CODES['Space'])
+            continue
+
+        # Prefer VK mapping for normal characters (this matches how send_key works).
+        vk_scan = user32.VkKeyScanW(ch) if user32 else -1
+        if vk_scan != -1:
+            vk = vk_scan & 0xFF
+            shift_state = (vk_scan >> 8) & 0xFF
+
+            mods = []
+            if shift_state & 0x01:
+                mods.append(VK_CODES['Shift'])
+            if shift_state & 0x02:
+                mods.append(VK_CODES['Control'])
+            if shift_state & 0x04:
+                mods.append(VK_CODES['Alt'])
+
+            if mods:
+                press_combo(mods, vk)
+            else:
+                press_vk(vk)
+            continue
+
+        # Fallback: Unicode injection (for characters that don't map to a VK on this layout).
+        type_unicode(ch)
+
+
+SEND_TEXT_BATCHED = True
+
+
+class _SendInputBackend:
+    """Injects compiled (vk, scan, flags) keyboard events with one SendInput call."""
+
+    def keyboard_layout(self) -> int:
+        return user32.GetKeyboardLayout(0) or 0
+
+    def vk_key_scan(self, ch: str, layout: int) -> int:
+        return user32.VkKeyScanExW(ch, layout)
+
+    def send(self, events: list) -> int:
+        if not events:
+            return 0
+
+        inputs = (INPUT * len(events))()
+        for item, (vk, scan, flags) in zip(inputs, events):
+            item.type = INPUT_KEYBOARD
+            item.ki.wVk = vk
+            item.ki.wScan = scan
+            item.ki.dwFlags = flags
+        return user32.SendInput(len(events), inputs, ctypes.sizeof(INPUT))
+
+
+class _RecordingBackend:
+    """Injection backend that records batches instead of sending them.
+
+    Character lookups follow the US layout, so event sequences are the same
+    as on a default Windows install.
+    """
+
+    def __init__(self):
+        self.batches = []
+
+    def keyboard_layout(self) -> int:
+        return 0x04090409
+
+    def vk_key_scan(self, ch: str, layout: int) -> int:
+        if 'a' <= ch <= 'z':
+            return ord(ch.upper())
+        if 'A' <= ch <= 'Z':
+            return 0x100 | ord(ch)
+        shifted = {'!': '1', '@': '2', '#': '3', '$': '4', '%': '5', '^': '6', '&': '7', '*': '8',
+                   '(': '9', ')': '0', '_': '-', '+': '=', '{': '[', '}': ']', '|': '\\',
+                   ':': ';', '"': "'", '<': ',', '>': '.', '?': '/', '~': '`'}
+        if ch in shifted:
+            return 0x100 | VK_CODES[shifted[ch]]
+        if ch in VK_CODES and ch != '+':
+            return VK_CODES[ch]
+        return -1
+
+    def send(self, events: list) -> int:
+        self.batches.append(list(events))
+        return len(events)
+
+
+_input_backend = _SendInputBackend() if user32 else _RecordingBackend()
+
+_vk_scan_cache = {}
+
+
+def _set_input_backend(backend):
+    global _input_backend
+    _input_backend = backend
+    _vk_scan_cache.clear()
+
+
+def _vk_scan(backend, ch: str, layout: int) -> int:
+    key = (layout, ch)
+    v = _vk_scan_cache.get(key)
+    if v is None:
+        v = backend.vk_key_scan(ch, layout)
+        _vk_scan_cache[key] = v
+    return v
+
+
+def _combo_events(mod_vks, vk: int) -> list:
+    """Modifiers down, key down/up, modifiers up in reverse (press_combo as events)."""
+    events = [(m, 0, 0) for m in mod_vks]
+    events.append((vk, 0, 0))
+    events.append((vk, 0, KEYEVENTF_KEYUP))
+    events.extend((m, 0, KEYEVENTF_KEYUP) for m in reversed(list(mod_vks)))
+    return events
+
+
+_TEXT_CONTROL_KEYS = {'\n': 'Enter', '\t': 'Tab', '\b': 'Backspace', ' ': 'Space'}
+
+
+def _compile_text(text: str, backend) -> list:
+    """Compile text into the keyboard events send_text would produce one call at a time."""
+    layout = backend.keyboard_layout()
+    events = []
+    for ch in text:
+        name = _TEXT_CONTROL_KEYS.get(ch)
+        if name is not None:
+            events.extend(_combo_events((), VK_CODES[name]))
+            continue
+
+        vk_scan = _vk_scan(backend, ch, layout)
+        if vk_scan != -1:
+            shift_state = (vk_scan >> 8) & 0xFF
+            mods = []
+            if shift_state & 0x01:
+                mods.append(VK_CODES['Shift'])
+            if shift_state & 0x02:
+                mods.append(VK_CODES['Control'])
+            if shift_state & 0x04:
+                mods.append(VK_CODES['Alt'])
+            events.extend(_combo_events(mods, vk_scan & 0xFF))
+            continue
+
+        # No key for this character on the layout: inject its UTF-16 units.
+        data = ch.encode('utf-16-le')
+        for i in range(0, len(data), 2):
+            unit = data[i] | (data[i + 1] << 8)
+            events.append((0, unit, KEYEVENTF_UNICODE))
+            events.append((0, unit, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+    return events
+
+
+class _KeyDispatcher:
+    """Background worker that injects keystrokes queued by the bridge thread.
+
+    Bridge calls only enqueue (target hwnd, events) and return. The worker
+    drains everything queued so far and, per run of consecutive items for the
+    same target, focuses once and injects all their events in one batch.
+    Queue wait times (enqueue to injection) are kept for get_dispatch_stats.
+    """
+
+    WAIT_SAMPLES = 1024
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue = []
+        self._busy = False
+        self._thread = None
+        self._waits = []
+        self._wait_pos = 0
+        self._count = 0
+        self._batches = 0
+        self._max_wait = 0.0
+        self._total_wait = 0.0
+
+    def submit(self, target: Optional[int], item):
+        """Queue item: a list of (vk, scan, flags) events, or a callable to run as is."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._queue.append((target, item, time.perf_counter()))
+            self._cond.notify()
+
+    def wait_idle(self, timeout_s: float = 1.0) -> bool:
+        deadline = time.perf_counter() + timeout_s
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _record_wait(self, wait: float):
+        self._count += 1
+        self._total_wait += wait
+        if wait > self._max_wait:
+            self._max_wait = wait
+        if len(self._waits) < self.WAIT_SAMPLES:
+            self._waits.append(wait)
+        else:
+            self._waits[self._wait_pos] = wait
+            self._wait_pos = (self._wait_pos + 1) % self.WAIT_SAMPLES
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            count = self._count
+            out = {
+                'keystrokes': count,
+                'batches': self._batches,
+                'queued': len(self._queue),
+                'wait_ms_avg': (self._total_wait / count) * 1000 if count else 0.0,
+                'wait_ms_max': self._max_wait * 1000,
+            }
+
+        for name, q in (('wait_ms_p50', 0.50), ('wait_ms_p95', 0.95), ('wait_ms_p99', 0.99)):
+            out[name] = waits[min(len(waits) - 1, int(q * len(waits)))] * 1000 if waits else 0.0
+        return out
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._busy = False
+                    self._cond.notify_all()
+                    self._cond.wait()
+                pending = self._queue
+                self._queue = []
+                self._busy = True
+
+            i = 0
+            while i < len(pending):
+                target = pending[i][0]
+                j = i
+                while j < len(pending) and pending[j][0] == target:
+                    j += 1
+                try:
+                    self._inject(target, pending[i:j])
+                except Exception:
+                    pass
+                i = j
+
+    def _inject(self, target: Optional[int], items: list):
+        if target and target != _get_osk_hwnd():
+            _ensure_foreground(target)
+
+        started = time.perf_counter()
+        events = []
+        for _, item, _ in items:
+            if callable(item):
+                # Unbatched text: flush what is queued ahead of it first.
+                if events:
+                    _input_backend.send(events)
+                    events = []
+                item()
+            else:
+                events.extend(item)
+        if events:
+            _input_backend.send(events)
+
+        _metrics.record('dispatch.inject', time.perf_counter() - started)
+        with self._cond:
+            self._batches += 1
+            for _, _, queued_at in items:
+                self._record_wait(started - queued_at)
+                _metrics.record('dispatch.queue_wait', started - queued_at)
+
+
+_key_dispatcher = _KeyDispatcher()
+
+
+@_instrument_api
 class Api:
     """JS→Python bridge. Exposed to JavaScript as window.pywebview.api."""
 
@@ -745,55 +4264,106 @@ class Api:
         normalized, _, _freq = parsed
 
         with _usage_lock:
-            _usage[normalized] = _usage.get(normalized, 0) + 1
-            snapshot = dict(_usage)
-
-        _save_usage(snapshot)
+            value, evicted = _usage.add(normalized)
+            _usage_journal.add(normalized)
+
+            with _words_lock:
+                index = _word_index
+            indexes = _profile_indexes.indexes()
+            if index is not None and index not in indexes:
+                indexes.append(index)
+            for loaded in indexes:
+                loaded.set_usage(normalized, value)
+                for term in evicted:
+                    loaded.set_usage(term, 0)
+
+        # Cached session results no longer reflect the new score.
+        _suggest_session.reset()
+        _suggest_cache.invalidate_terms([normalized] + evicted)
         return True
 
-    def suggest(self, prefix: str, limit: int = 3):
+    def _normalize_suggest_args(self, prefix, limit):
         if not isinstance(prefix, str):
-            return []
-
-        p = prefix.strip().lower()
-        if not p:
-            return []
-
-        with _words_lock:
-            words = _words
-            freqs = _base_freq
-            display_map = _display_map
-
-        if not words:
-            return []
-
-        with _usage_lock:
-            usage = _usage
-
-        start = bisect.bisect_left(words, p)
+            return None, None, None, 0
 
         limit = int(limit) if isinstance(limit, (int, float)) else 3
         limit = max(1, min(10, limit))
 
-        scan_limit = 5000
-        usage_boost = 1000
-
-        best = []
-        for i in range(start, min(start + scan_limit, len(words))):
-            w = words[i]
-            if not w.startswith(p):
-                break
+        p = ' '.join(prefix.lower().split())
+        if not p:
+            return None, None, p, limit
 
-            base = freqs.get(w, 1) if freqs else 1
-            score = (usage.get(w, 0) * usage_boost) + base
-            best.append((score, w))
+        with _words_lock:
+            index = _word_index
+            profile = _active_profile
+
+        return index, profile, p, limit
+
+    def _cached_suggest(self, prefix, limit, compute, order=None):
+        """Suggestions for prefix, or None if a newer request superseded the lookup."""
+        index, profile, p, limit = self._normalize_suggest_args(prefix, limit)
+        if not isinstance(order, int) or isinstance(order, bool):
+            order = None
+        if p == '' or index is None:
+            _suggest_worker.supersede(order)
+            if p == '':
+                return _ngram_model.predict(_word_tracker.context(), limit)
+            return []
 
-        best.sort(key=lambda t: (-t[0], t[1]))
-        out = []
-        for _, w in best[:limit]:
-            out.append(display_map.get(w, w) if display_map else w)
+        out = _suggest_cache.get(profile, p, limit)
+        if out is not None:
+            _suggest_worker.supersede(order)
+            return out
+
+        # Stamp before reading the index: a publish in between then leaves
+        # this result stale instead of caching it as current.
+        stamp = _suggest_cache.stamp(p)
+
+        def lookup(cancelled):
+            with _words_lock:
+                index = _word_index
+                if index is None or _active_profile != profile:
+                    return []
+
+            if ' ' in p:
+                return _suggest_phrase(index, p, limit, lambda i, w, n: compute(i, w, n, cancelled))
+            return compute(index, p, limit, cancelled)
+
+        out = _suggest_worker.run(lookup, order)
+        if out is not None:
+            _suggest_cache.put(profile, p, limit, out, stamp)
+            if _startup.mark('first_suggestion') and STARTUP_TRACE:
+                try:
+                    _startup.dump(_startup_trace_path())
+                except OSError:
+                    pass
         return out
 
+    def suggest(self, prefix: str, limit: int = 3, request_id=None):
+        """Suggestions for prefix; request_id, if given, increases with each of the page's requests."""
+        def compute(index, p, limit, cancelled):
+            if not isinstance(index, _CompletionIndex):
+                return index.suggest(p, limit)
+            return index.suggest(p, limit, cancelled)
+
+        # A superseded lookup answers []; the page drops it anyway.
+        return self._cached_suggest(prefix, limit, compute, request_id) or []
+
+    @staticmethod
+    def _session_compute(index, p, limit, cancelled):
+        if not isinstance(index, _CompletionIndex):
+            return index.suggest(p, limit)
+        return _suggest_session.suggest(index, p, limit, cancelled)
+
+    def session_suggest(self, prefix: str, limit: int = 3, request_id=None):
+        """Like suggest, but reuses the narrowed range from the previous call for this word."""
+        return self._cached_suggest(prefix, limit, self._session_compute, request_id) or []
+
+    def session_reset(self):
+        """End the current word's suggestion session."""
+        _suggest_session.reset()
+        return True
+
     def send_key(self, data):
         if isinstance(data, str):
             logical = data.strip()
@@ -807,12 +4377,6 @@ class Api:
         if not logical:
             return
 
-        target_hwnd = _get_last_target_hwnd()
-        osk_hwnd = _get_osk_hwnd()
-        if target_hwnd and target_hwnd != osk_hwnd:
-            _focus_window(target_hwnd)
-            time.sleep(0.01)
-
         normalized_mods = []
         for m in modifiers:
             m = str(m).strip()
@@ -824,10 +4388,10 @@ class Api:
         else:
             key = logical
 
+        _word_tracker.feed_key(key, normalized_mods)
+
         if key == '+':
-            shift_vk = VK_CODES['Shift']
-            equal_vk = VK_CODES['=']
-            press_combo([shift_vk], equal_vk)
+            _key_dispatcher.submit(_get_last_target_hwnd(), _combo_events([VK_CODES['Shift']], VK_CODES['=']))
             return
 
         vk = VK_CODES.get(key)
@@ -835,10 +4399,7 @@ class Api:
             return
 
         mod_vks = [VK_CODES[m] for m in normalized_mods if m in VK_CODES]
-        if mod_vks:
-            press_combo(mod_vks, vk)
-        else:
-            press_vk(vk)
+        _key_dispatcher.submit(_get_last_target_hwnd(), _combo_events(mod_vks, vk))
 
     def send_text(self, text):
         if not isinstance(text, str):
@@ -847,46 +4408,164 @@ class Api:
         if not text:
             return
 
-        target_hwnd = _get_last_target_hwnd()
-        osk_hwnd = _get_osk_hwnd()
-        if target_hwnd and target_hwnd != osk_hwnd:
-            _focus_window(target_hwnd)
-            time.sleep(0.03)
+        _word_tracker.feed_text(text)
 
-        for ch in text:
-            if ch == '\n':
-                press_vk(VK_CODES['Enter'])
-                continue
-            if ch == '\t':
-                press_vk(VK_CODES['Tab'])
-                continue
+        if SEND_TEXT_BATCHED:
+            # One SendInput for the whole string, so other input cannot interleave.
+            _key_dispatcher.submit(_get_last_target_hwnd(), _compile_text(text, _input_backend))
+        else:
+            _key_dispatcher.submit(_get_last_target_hwnd(), lambda: _type_text_unbatched(text))
 
-            if ch == ' ':
-                press_vk(VK_CODES['Space'])
-                continue
+        _suggestion_pusher.notify()
 
-            # Prefer VK mapping for normal characters (this matches how send_key works).
-            vk_scan = user32.VkKeyScanW(ch) if user32 else -1
-            if vk_scan != -1:
-                vk = vk_scan & 0xFF
-                shift_state = (vk_scan >> 8) & 0xFF
-
-                mods = []
-                if shift_state & 0x01:
-                    mods.append(VK_CODES['Shift'])
-                if shift_state & 0x02:
-                    mods.append(VK_CODES['Control'])
-                if shift_state & 0x04:
-                    mods.append(VK_CODES['Alt'])
-
-                if mods:
-                    press_combo(mods, vk)
-                else:
-                    press_vk(vk)
+    def run_macro(self, index):
+        """Type macro index from its compiled program; False if there is no such macro or it is empty."""
+        if not isinstance(index, int) or not 0 <= index < MACRO_COUNT:
+            return False
+
+        program = _macro_program(index)
+        if not program or not program['steps']:
+            return False
+
+        for op in program['track']:
+            if op[0] == 'text':
+                _word_tracker.feed_text(op[1])
+            else:
+                _word_tracker.feed_key(op[1], op[2])
+
+        steps = program['steps']
+        if len(steps) == 1 and steps[0][0] == 'keys':
+            _key_dispatcher.submit(_get_last_target_hwnd(), steps[0][1])
+        else:
+            # Delays run on the dispatcher thread, so keys typed meanwhile wait their turn.
+            _key_dispatcher.submit(_get_last_target_hwnd(), lambda: _run_macro_steps(steps))
+
+        _suggestion_pusher.notify()
+        return True
+
+    def send_key_and_suggest(self, data, limit: int = 3):
+        """send_key, then get_tracked_suggestions, in one bridge round trip."""
+        self.send_key(data)
+        return self.get_tracked_suggestions(limit)
+
+    def get_tracked_suggestions(self, limit: int = 3):
+        """Suggestions for the word Python tracks: {'version', 'word', 'phrase', 'suggestions'}.
+
+        phrase holds the earlier words of a multi-word phrase, each followed by
+        a space. suggestions is None if a newer request superseded the lookup;
+        a result with a lower version than one already seen is stale as well.
+        """
+        version, word, head = _word_tracker.state()
+        suggestions = self._cached_suggest(head + word if word else '', limit, self._session_compute, version)
+        return {'version': version, 'word': word, 'phrase': head, 'suggestions': suggestions}
+
+    def get_profiles(self):
+        """Dictionary profiles, the active one, and the indexes currently loaded."""
+        with _words_lock:
+            active = _active_profile
+        return {
+            'active': active,
+            'profiles': sorted(_load_profiles()),
+            'loaded': _profile_indexes.stats(),
+        }
+
+    def set_profile(self, name):
+        """Switch dictionaries; a profile loaded before is live at once, others load in the background."""
+        if not isinstance(name, str) or name not in _load_profiles():
+            return False
+
+        with _words_lock:
+            if name == _active_profile and _word_index is not None:
+                return True
+
+        if not _activate_profile(name):
+            _load_profile_async(name)
+
+        _config.set('profile', name)
+        return True
+
+    def get_dictionary_status(self):
+        """Dictionary readiness: state ('idle', 'loading', 'ready'), stage, progress (0..1), terms."""
+        with _status_lock:
+            return dict(_dictionary_status)
+
+    def get_dispatch_stats(self):
+        return _key_dispatcher.stats()
+
+    def get_suggest_worker_stats(self):
+        """Lookups completed, dropped while queued and aborted in flight for a newer request."""
+        return _suggest_worker.stats()
+
+    def get_suggest_cache_stats(self):
+        return _suggest_cache.stats()
+
+    def get_metrics(self):
+        """Latency histograms (p50/p95/p99 per Api method and background stage)."""
+        return {
+            'enabled': _metrics.enabled,
+            'profiling': _stack_sampler.running,
+            'metrics': _metrics.snapshot(),
+        }
+
+    def set_metrics_enabled(self, enabled):
+        _metrics.enabled = bool(enabled)
+        # The page only times bridge calls while metrics are recorded.
+        _suggestion_pusher.run_js('window.hexkbdSetMetricsEnabled && window.hexkbdSetMetricsEnabled(%s)'
+                                  % json.dumps(_metrics.enabled))
+        return _metrics.enabled
+
+    def reset_metrics(self):
+        _metrics.reset()
+        return True
+
+    def record_bridge_timings(self, timings):
+        """Record round trips measured by the page, as bridge.<method>."""
+        if not isinstance(timings, dict) or not _metrics.enabled:
+            return False
+
+        for name, values in timings.items():
+            if not isinstance(name, str) or not re.fullmatch(r'\w{1,40}', name) or not isinstance(values, list):
                 continue
+            for ms in values[:500]:
+                if isinstance(ms, (int, float)) and ms >= 0:
+                    _metrics.record('bridge.' + name, ms / 1000)
+        return True
+
+    def dump_metrics(self):
+        """Write metrics and related counters to a JSON file; returns its path."""
+        path = os.path.join(_config_dir(), time.strftime('metrics-%Y%m%d-%H%M%S.json'))
+        data = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'metrics': _metrics.snapshot(),
+            'dispatch': _key_dispatcher.stats(),
+            'suggest_cache': _suggest_cache.stats(),
+            'dictionary': self.get_dictionary_status(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        return path
+
+    def get_startup_timeline(self):
+        """Startup phases reached so far: [{phase, ms since process start, thread}]."""
+        return _startup.snapshot()
+
+    def mark_startup_phase(self, phase):
+        """Record a phase reached by the page, as page.<phase>."""
+        if not isinstance(phase, str) or not re.fullmatch(r'\w{1,40}', phase):
+            return False
+        return _startup.mark('page.' + phase)
+
+    def dump_startup_timeline(self):
+        """Write the startup timeline to a JSON file; returns its path."""
+        return _startup.dump(_startup_trace_path())
+
+    def start_profiling(self):
+        """Start sampling every thread's stack; stop_profiling writes the result."""
+        return _stack_sampler.start()
 
-            # Fallback: Unicode injection (for characters that don't map to a VK on this layout).
-            type_unicode(ch)
+    def stop_profiling(self):
+        path = os.path.join(_config_dir(), time.strftime('profile-%Y%m%d-%H%M%S.txt'))
+        return _stack_sampler.stop(path)
 
 
 def resource_path(relative_path: str) -> str:
@@ -908,12 +4587,13 @@ def main():
         print('keyboard.html not found at:', html_file)
         return
 
+    _startup.mark('main')
     api = Api()
 
     # Seed the "last target" with whatever window was active before we created ours.
     _set_last_target_hwnd(_get_foreground_hwnd())
 
-    webview.create_window(
+    window = webview.create_window(
         WINDOW_TITLE,
         html_file,
         js_api=api,
@@ -922,9 +4602,16 @@ def main():
         resizable=True,
         on_top=True
     )
+    _suggestion_pusher.attach(window, api)
+    _startup.mark('window_created')
 
     webview.start(_on_webview_started)
 
 
 if __name__ == '__main__':
+    # Parse workers re-run this file, or a frozen build's executable; only the
+    # latter has to be handed over to multiprocessing here (a no-op otherwise).
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     main()
\ No newline at end of file
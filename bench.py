@@ -0,0 +1,425 @@
+"""Headless benchmarks for the keyboard's hot paths.
+
+Runs anywhere Python does: pywebview is replaced by a stand-in module when it
+is not installed, and key injection always goes to a recording backend
+instead of user32, so nothing is typed.
+
+    python bench.py                       # full run, writes bench_results.json
+    python bench.py --quick               # small dictionaries only
+    python bench.py --save-baseline       # store this run as the baseline
+    python bench.py --baseline bench_baseline.json
+
+With a baseline present, every timing that got slower than the baseline by
+more than --tolerance is reported and the exit code is 1.
+"""
+
+import argparse
+import functools
+import gc
+import http.server
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+
+try:
+    import webview  # noqa: F401
+except ImportError:
+    webview = types.ModuleType('webview')
+    webview.create_window = lambda *args, **kwargs: None
+    webview.start = lambda *args, **kwargs: None
+    sys.modules['webview'] = webview
+
+# app resolves its data directory from APPDATA on every call, so point it at
+# a scratch directory before anything touches the disk.
+_WORKDIR = tempfile.mkdtemp(prefix='hexkbd-bench-')
+os.environ['APPDATA'] = _WORKDIR
+
+import app  # noqa: E402
+
+FULL_SIZES = (10_000, 100_000, 1_000_000, 5_000_000)
+QUICK_SIZES = (10_000, 100_000)
+SUGGEST_SIZE = 370_000
+USAGE_SIZES = (100, 1_000, 10_000, 100_000)
+
+_SYLLABLES = [c + v for c in 'bcdfghjklmnprstvwz' for v in 'aeiou'] + ['th', 'st', 'ng', 'qu', 'x', 'y']
+
+# Metric name suffixes where a larger value is a regression, with the smallest
+# absolute change worth reporting; everything else (counts, throughput) is
+# informational.
+_LOWER_IS_BETTER = {'_s': 0.005, '_ms': 0.2, '_mb': 1.0}
+
+
+def _synthetic_word(i: int) -> str:
+    # Bijective base-N over syllables: every index yields a distinct word.
+    parts = []
+    n = i + 1
+    while n:
+        n, r = divmod(n - 1, len(_SYLLABLES))
+        parts.append(_SYLLABLES[r])
+    return ''.join(parts)
+
+
+def _write_dictionary(size: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    words = [_synthetic_word(i) for i in range(size)]
+    rng.shuffle(words)
+
+    path = app._wordlist_path(app.WORDLIST_FILENAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        for w in words:
+            # Zipf-ish weights on a minority of lines, like a frequency list.
+            if rng.random() < 0.2:
+                f.write(f'{w}\t{int(1000 / rng.randint(1, 1000))}\n')
+            else:
+                f.write(w + '\n')
+    return words
+
+
+def _reset_dictionary_state():
+    for filename in (app.WORDLIST_FILENAME, app.WORDLIST_CACHE_FILENAME):
+        try:
+            os.remove(app._wordlist_path(filename))
+        except FileNotFoundError:
+            pass
+    with app._words_lock:
+        app._word_index = None
+    app._profile_indexes = app._ProfileIndexes()
+    app._suggest_session.reset()
+    gc.collect()
+
+
+def _percentile(samples: list, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def bench_load(sizes) -> dict:
+    out = {}
+    for size in sizes:
+        _reset_dictionary_state()
+        _write_dictionary(size)
+        workers = app._parse_workers(sum(os.path.getsize(path) for _, path in app._wordlist_sources()
+                                         if os.path.exists(path)))
+
+        t = time.perf_counter()
+        terms, weights, display_map = app._load_wordlist()
+        parse_s = time.perf_counter() - t
+        del terms, weights, display_map
+        gc.collect()
+
+        tracemalloc.start()
+        app._load_wordlist()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        gc.collect()
+
+        # Full startup path: parse, index, compile the cache, then a warm start.
+        t = time.perf_counter()
+        app._init_wordlist_background()
+        cold_s = time.perf_counter() - t
+
+        with app._words_lock:
+            app._word_index = None
+        gc.collect()
+
+        t = time.perf_counter()
+        index = app._load_compiled_wordlist(app._wordlist_sources())
+        cache_s = time.perf_counter() - t
+        del index
+
+        out[str(size)] = {
+            'parse_s': parse_s,
+            'parse_workers': workers,
+            'parse_peak_mb': peak / (1 << 20),
+            'cold_start_s': cold_s,
+            'cache_load_s': cache_s,
+        }
+        print(f'  load {size:>9,}: parse {parse_s:.2f}s ({workers or 1} proc), peak {peak / (1 << 20):.0f} MB, '
+              f'cold {cold_s:.2f}s, cache {cache_s * 1000:.1f} ms')
+
+    _reset_dictionary_state()
+    return out
+
+
+def bench_first_run(size: int) -> dict:
+    """First start with no words.txt: download from a local server while parsing."""
+    _reset_dictionary_state()
+    _write_dictionary(size)
+    source_dir = tempfile.mkdtemp(dir=_WORKDIR)
+    shutil.move(app._wordlist_path(app.WORDLIST_FILENAME), os.path.join(source_dir, 'words.txt'))
+
+    handler = functools.partial(_QuietHandler, directory=source_dir)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/words.txt'
+
+    defaults = app._stream_wordlist_download.__defaults__
+    app._stream_wordlist_download.__defaults__ = (url,) + defaults[1:]
+    try:
+        t = time.perf_counter()
+        app._init_wordlist_background()
+        ready_s = time.perf_counter() - t
+    finally:
+        app._stream_wordlist_download.__defaults__ = defaults
+        server.shutdown()
+        server.server_close()
+
+    out = {'first_run_s': ready_s, 'terms': app._dictionary_status['terms']}
+    print(f'  first run {size:,}: ready in {ready_s:.2f}s')
+    _reset_dictionary_state()
+    return out
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def bench_suggest(size: int, queries: int = 500) -> dict:
+    _reset_dictionary_state()
+    words = _write_dictionary(size)
+    app._init_wordlist_background()
+
+    rng = random.Random(2)
+    api = app.Api()
+    out = {}
+    for length in range(1, 9):
+        prefixes = [w[:length] for w in rng.sample(words, queries) if len(w) >= length]
+        if not prefixes:
+            continue
+        for name, fn in (('suggest', api.suggest), ('session_suggest', api.session_suggest)):
+            # Cold: the result cache is emptied first, so the lookup itself is
+            # timed. Warm: the same call again, answered from the cache.
+            samples = []
+            warm = []
+            for p in prefixes:
+                if name == 'session_suggest':
+                    api.session_reset()
+                    for k in range(1, length):
+                        fn(p[:k], 3)
+                app._suggest_cache.invalidate_all()
+                t = time.perf_counter()
+                fn(p, 3)
+                samples.append((time.perf_counter() - t) * 1000)
+                t = time.perf_counter()
+                fn(p, 3)
+                warm.append((time.perf_counter() - t) * 1000)
+            out[f'{name}_len{length}'] = {
+                'p50_ms': _percentile(samples, 0.50),
+                'p99_ms': _percentile(samples, 0.99),
+                'warm_p50_ms': _percentile(warm, 0.50),
+                'warm_p99_ms': _percentile(warm, 0.99),
+            }
+        stats = out[f'suggest_len{length}']
+        print(f'  suggest len {length}: p50 {stats["p50_ms"]:.3f} ms, p99 {stats["p99_ms"]:.3f} ms '
+              f'(cached p50 {stats["warm_p50_ms"]:.3f} ms)')
+
+    out['cache'] = api.get_suggest_cache_stats()
+    print(f'  result cache: {out["cache"]["hits"]} hits, {out["cache"]["misses"]} misses')
+
+    # Fast typing: every keystroke's lookup is sent before the previous one is
+    # answered, as when the page fires suggest calls back to back. Timed from
+    # the first call to the last word's answer.
+    samples = []
+    before = api.get_suggest_worker_stats()
+    for w in rng.sample([w for w in words if len(w) >= 5], 50):
+        api.session_reset()
+        threads = [threading.Thread(target=api.session_suggest, args=(w[:k] + 'q', 3))
+                   for k in range(1, len(w) + 1)]
+        t = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        samples.append((time.perf_counter() - t) * 1000)
+    after = api.get_suggest_worker_stats()
+    out['burst'] = {
+        'word_p50_ms': _percentile(samples, 0.50),
+        'word_p99_ms': _percentile(samples, 0.99),
+        'dropped': after['dropped'] - before['dropped'],
+        'aborted': after['aborted'] - before['aborted'],
+    }
+    print(f'  typing burst: word p50 {out["burst"]["word_p50_ms"]:.3f} ms, '
+          f'{out["burst"]["dropped"]} dropped, {out["burst"]["aborted"]} aborted')
+
+    _reset_dictionary_state()
+    return out
+
+
+def bench_usage(sizes) -> dict:
+    out = {}
+    api = app.Api()
+    for size in sizes:
+        model = app._UsageModel()
+        for i in range(size):
+            model.add(_synthetic_word(i))
+        with app._usage_lock:
+            app._usage = model
+        app._usage_journal.compact()
+
+        samples = []
+        for i in range(1000):
+            t = time.perf_counter()
+            api.record_usage(_synthetic_word(i % size))
+            samples.append((time.perf_counter() - t) * 1000)
+
+        t = time.perf_counter()
+        app._usage_journal.flush()
+        flush_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        app._usage_journal.compact()
+        compact_s = time.perf_counter() - t
+
+        out[str(size)] = {
+            'record_p50_ms': _percentile(samples, 0.50),
+            'record_p99_ms': _percentile(samples, 0.99),
+            'flush_s': flush_s,
+            'compact_s': compact_s,
+        }
+        print(f'  usage {size:>7,}: record p99 {out[str(size)]["record_p99_ms"]:.3f} ms, '
+              f'compact {compact_s * 1000:.1f} ms')
+    return out
+
+
+def bench_send_text() -> dict:
+    backend = app._RecordingBackend()
+    app._set_input_backend(backend)
+    app._set_last_target_hwnd(None)
+    api = app.Api()
+
+    samples = {
+        'word': 'keyboard ',
+        'sentence': 'The quick brown fox jumps over the lazy dog. ',
+        'mixed': 'Café déjà vu, naïve Zoë! (100% sure) ',
+    }
+
+    out = {}
+    for name, text in samples.items():
+        backend.batches.clear()
+        api.send_text(text)
+        app._key_dispatcher.wait_idle()
+        events = sum(len(b) for b in backend.batches)
+        batches = len(backend.batches)
+
+        rounds = 500
+        t = time.perf_counter()
+        for _ in range(rounds):
+            api.send_text(text)
+        app._key_dispatcher.wait_idle(30.0)
+        elapsed = time.perf_counter() - t
+
+        out[name] = {
+            'chars': len(text),
+            'events': events,
+            'batches': batches,
+            'chars_per_sec': rounds * len(text) / elapsed,
+        }
+        print(f'  send_text {name}: {len(text)} chars -> {events} events, '
+              f'{out[name]["chars_per_sec"]:,.0f} chars/s')
+
+    out['dispatch'] = app._key_dispatcher.stats()
+    return out
+
+
+def _flatten(data: dict, prefix: str = '') -> dict:
+    flat = {}
+    for k, v in data.items():
+        key = f'{prefix}.{k}' if prefix else k
+        if isinstance(v, dict):
+            flat.update(_flatten(v, key))
+        elif isinstance(v, (int, float)):
+            flat[key] = v
+    return flat
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return (metric, baseline, current) for every timing that regressed."""
+    current = _flatten(results.get('benchmarks', {}))
+    previous = _flatten(baseline.get('benchmarks', {}))
+    regressions = []
+    for key, old in previous.items():
+        new = current.get(key)
+        suffix = next((t for t in _LOWER_IS_BETTER if key.endswith(t)), None)
+        if new is None or suffix is None:
+            continue
+        if new > old * (1 + tolerance) and new - old > _LOWER_IS_BETTER[suffix]:
+            regressions.append((key, old, new))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='only the small dictionary sizes')
+    parser.add_argument('--sizes', help='comma-separated dictionary sizes for the load benchmark')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default='bench_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run to --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        sizes = tuple(int(x) for x in args.sizes.split(','))
+    else:
+        sizes = QUICK_SIZES if args.quick else FULL_SIZES
+
+    app._copy_bundled_wordlist_extras_if_missing()
+
+    try:
+        print('dictionary load')
+        benchmarks = {'load': bench_load(sizes)}
+        print('first run')
+        benchmarks['first_run'] = bench_first_run(min(SUGGEST_SIZE, max(sizes)))
+        print('suggest')
+        benchmarks['suggest'] = bench_suggest(min(SUGGEST_SIZE, max(sizes)))
+        print('usage persistence')
+        benchmarks['usage'] = bench_usage(USAGE_SIZES[:2] if args.quick else USAGE_SIZES)
+        print('text injection')
+        benchmarks['send_text'] = bench_send_text()
+    finally:
+        app._usage_journal.close()
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'benchmarks': benchmarks,
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print('results written to', args.output)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print('baseline written to', args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for key, old, new in regressions:
+        print(f'REGRESSION {key}: {old:.4g} -> {new:.4g}')
+    if not regressions:
+        print('no regressions against', args.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
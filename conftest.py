@@ -0,0 +1,12 @@
+import sys
+import types
+
+# app imports webview at module level but the tests never open a window; use
+# the same stand-in as bench.py where pywebview is not installed.
+try:
+    import webview  # noqa: F401
+except ImportError:
+    webview = types.ModuleType('webview')
+    webview.create_window = lambda *args, **kwargs: None
+    webview.start = lambda *args, **kwargs: None
+    sys.modules['webview'] = webview
@@ -0,0 +1,331 @@
+import hashlib
+import http.server
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture(autouse=True)
+def config_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('APPDATA', str(tmp_path))
+    return tmp_path
+
+
+def _terms(index, ids):
+    return [index.words[i] for i in ids]
+
+
+def test_compiled_cache_ignores_usage_boosts_from_save_time():
+    index = app._build_index({'anchovy': 1, 'apple': 50, 'avocado': 2, 'austria': 40}, {})
+    index.set_usage('anchovy', 10)
+    app._save_compiled_wordlist(index, {})
+
+    loaded = app._load_compiled_wordlist([])
+    lo, hi = loaded.prefix_range('a')
+    assert _terms(loaded, loaded.top_k(lo, hi, 3)) == ['apple', 'austria', 'avocado']
+
+
+def test_typo_matches_never_outrank_exact_matches():
+    index = app._build_index({'the': 1, 'they': 1, 'texas': 100, 'tesla': 100, 'shenzhen': 100}, {})
+    assert index.suggest('the', 3)[:2] == ['the', 'they']
+
+    index = app._build_index({'the': 3, 'they': 2, 'them': 1, 'texas': 100}, {})
+    assert index.suggest('the', 3) == ['the', 'they', 'them']
+
+
+def test_macro_single_character_braces_stay_literal():
+    backend = app._RecordingBackend()
+    template = '\\frac{a}{b}'
+    program = app._compile_macro(template, backend)
+    assert program['steps'] == [['keys', [list(e) for e in app._compile_text(template, backend)]]]
+
+
+def test_macro_shifted_character_key_adds_shift():
+    program = app._compile_macro('{Ctrl++}', app._RecordingBackend())
+    control, shift, plus = app.VK_CODES['Control'], app.VK_CODES['Shift'], app.VK_CODES['=']
+    assert program['steps'] == [['keys', [
+        [control, 0, 0], [shift, 0, 0], [plus, 0, 0], [plus, 0, app.KEYEVENTF_KEYUP],
+        [shift, 0, app.KEYEVENTF_KEYUP], [control, 0, app.KEYEVENTF_KEYUP],
+    ]]]
+
+
+@pytest.fixture
+def recorder():
+    previous = app._input_backend
+    backend = app._RecordingBackend()
+    app._set_input_backend(backend)
+    yield backend
+    app._set_input_backend(previous)
+
+
+def _press(vk, *mods):
+    return [(m, 0, 0) for m in mods] + [(vk, 0, 0), (vk, 0, app.KEYEVENTF_KEYUP)] + \
+        [(m, 0, app.KEYEVENTF_KEYUP) for m in reversed(mods)]
+
+
+def test_send_text_injects_one_batch_per_call(recorder):
+    api = app.Api()
+    api.send_text('Hi!')
+    assert app._key_dispatcher.wait_idle()
+    api.send_text('\b\n\t')
+    assert app._key_dispatcher.wait_idle()
+
+    shift = app.VK_CODES['Shift']
+    vk = app.VK_CODES
+    assert recorder.batches == [
+        _press(vk['H'], shift) + _press(vk['I']) + _press(vk['1'], shift),
+        _press(vk['Backspace']) + _press(vk['Enter']) + _press(vk['Tab']),
+    ]
+
+
+def test_send_text_injects_unicode_for_characters_off_the_layout(recorder):
+    api = app.Api()
+    api.send_text('é😀')
+    assert app._key_dispatcher.wait_idle()
+
+    unicode, up = app.KEYEVENTF_UNICODE, app.KEYEVENTF_UNICODE | app.KEYEVENTF_KEYUP
+    assert recorder.batches == [[
+        (0, 0xE9, unicode), (0, 0xE9, up),
+        (0, 0xD83D, unicode), (0, 0xD83D, up),
+        (0, 0xDE00, unicode), (0, 0xDE00, up),
+    ]]
+
+
+def test_publish_evicting_a_profile_does_not_deadlock_with_watcher_poll(monkeypatch):
+    # poll holds the watcher lock while it waits for _usage_lock in
+    # _publish_word_index; an eviction must not wait for the watcher lock
+    # while holding _usage_lock.
+    monkeypatch.setattr(app, '_profile_memory_cap', lambda: 1)
+    monkeypatch.setattr(app, '_profile_indexes', app._ProfileIndexes())
+    app._wordlist_watcher.reset({}, 'old')
+    app._profile_indexes.put('old', app._build_index({'old': 1}, {}), 'old')
+
+    holding = threading.Event()
+
+    def poll():
+        with app._wordlist_watcher._lock:
+            holding.set()
+            time.sleep(0.1)
+            with app._usage_lock:
+                pass
+
+    poller = threading.Thread(target=poll, daemon=True)
+    poller.start()
+    holding.wait()
+    publisher = threading.Thread(target=app._publish_word_index,
+                                 args=(app._build_index({'new': 1}, {}),), kwargs={'profile': 'new'}, daemon=True)
+    publisher.start()
+
+    poller.join(2)
+    publisher.join(2)
+    assert not poller.is_alive() and not publisher.is_alive()
+    assert 'old' not in app._wordlist_watcher._states
+
+
+def test_suggest_worker_keeps_newer_lookup_when_older_request_arrives_late():
+    worker = app._SuggestWorker()
+    started = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def newer(cancelled):
+        started.set()
+        release.wait(2)
+        return [] if cancelled() else ['newer']
+
+    thread = threading.Thread(target=lambda: results.update(newer=worker.run(newer, 6)), daemon=True)
+    thread.start()
+    started.wait(2)
+
+    assert worker.run(lambda cancelled: ['older'], 5) is None
+    worker.supersede(5)
+    release.set()
+    thread.join(2)
+    assert results == {'newer': ['newer']}
+
+    # Once nothing newer is in flight, the order no longer matters.
+    assert worker.run(lambda cancelled: ['after'], 1) == ['after']
+
+
+def _touch(path, text):
+    # Bump mtime explicitly: an edit within the filesystem's timestamp
+    # granularity that keeps the size would otherwise go unnoticed.
+    before = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.utime(path, ns=(before + 10**9, before + 10**9))
+
+
+def _fresh_items():
+    terms, weights, display_map = app._load_wordlist()
+    return list(app._CompletionIndex(terms, weights, display_map).items())
+
+
+@pytest.fixture
+def watched():
+    """Default profile loaded, with the watcher past its first (full reload) change."""
+    base = app._wordlist_path(app.WORDLIST_FILENAME)
+    _touch(base, 'apple\t5\nbanana\t3\ncherry\ndate\t2\nLondon\t4\n')
+    app._init_wordlist_background()
+
+    custom = app._wordlist_path('custom.txt')
+    with open(custom, encoding='utf-8') as f:
+        text = f.read()
+    _touch(custom, text + 'Primer\t2\n')
+    assert app._wordlist_watcher.poll()
+    return base, custom
+
+
+def _edit_and_compare(path, edit):
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    _touch(path, edit(text))
+    assert app._wordlist_watcher.poll()
+    assert list(app._word_index.items()) == _fresh_items()
+
+
+def test_watcher_applies_added_custom_term(watched):
+    _, custom = watched
+    _edit_and_compare(custom, lambda text: text + 'Banana\t7\nZeppelin\t4\n')
+
+
+def test_watcher_applies_reweighted_custom_term(watched):
+    _, custom = watched
+    _edit_and_compare(custom, lambda text: text.replace('LOL\t80', 'LOL\t3'))
+
+
+def test_watcher_applies_removed_custom_term(watched):
+    _, custom = watched
+    _edit_and_compare(custom, lambda text: text.replace('Primer\t2\n', '').replace('LMAO\t35\n', ''))
+
+
+def test_watcher_applies_base_list_change(watched):
+    base, _ = watched
+    _edit_and_compare(base, lambda text: text.replace('banana\t3', 'banana\t9').replace('date\t2\n', '') + 'elder\n')
+
+
+_DOWNLOAD = ''.join('word%05d\n' % i for i in range(20000)).encode()
+
+
+@pytest.fixture
+def word_server():
+    """Local stand-in for the word list host.
+
+    state['range'] = False makes it ignore Range; state['cut'] = n drops the
+    next response's connection after n bytes.
+    """
+    state = {'range': True, 'cut': None, 'requests': []}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            requested = self.headers.get('Range')
+            state['requests'].append(requested)
+            start = 0
+            if requested and state['range']:
+                start = int(requested.split('=')[1].rstrip('-'))
+                self.send_response(206)
+            else:
+                self.send_response(200)
+            body = _DOWNLOAD[start:]
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            if state['cut']:
+                body, state['cut'] = body[:state['cut']], None
+                self.close_connection = True
+            self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state['url'] = 'http://127.0.0.1:%d/words.txt' % server.server_port
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def _download(url, **kwargs) -> bytes:
+    return b''.join(data for data, _ in app._stream_wordlist_download(url, **kwargs))
+
+
+def _leave_partial(size: int):
+    part = app._wordlist_path(app.WORDLIST_FILENAME) + '.part'
+    with open(part, 'wb') as f:
+        f.write(_DOWNLOAD[:size])
+    with open(part + '.validator', 'w', encoding='utf-8') as f:
+        f.write('"v1"')
+
+
+def test_download_resumes_with_range(word_server):
+    _leave_partial(12345)
+    assert _download(word_server['url'], sha256=hashlib.sha256(_DOWNLOAD).hexdigest()) == _DOWNLOAD
+    assert word_server['requests'] == ['bytes=12345-']
+    with open(app._wordlist_path(app.WORDLIST_FILENAME), 'rb') as f:
+        assert f.read() == _DOWNLOAD
+
+
+def test_download_restarts_when_server_ignores_range(word_server):
+    word_server['range'] = False
+    word_server['cut'] = 50000
+    # Interrupted after bytes were yielded; the retry gets the whole file again.
+    assert _download(word_server['url'], sha256=hashlib.sha256(_DOWNLOAD).hexdigest()) == _DOWNLOAD
+    assert word_server['requests'] == [None, 'bytes=50000-']
+    with open(app._wordlist_path(app.WORDLIST_FILENAME), 'rb') as f:
+        assert f.read() == _DOWNLOAD
+
+
+def test_download_checksum_mismatch_removes_partial_file(word_server):
+    with pytest.raises(ValueError):
+        _download(word_server['url'], sha256='0' * 64)
+
+    path = app._wordlist_path(app.WORDLIST_FILENAME)
+    assert not any(os.path.exists(p) for p in (path, path + '.part', path + '.part.validator'))
+
+
+_JOURNAL_ID = '0123456789abcdef'
+
+
+def _write_usage(counts: dict, journal: str, journal_id: str = _JOURNAL_ID):
+    """usage.bin holding counts, and a journal following compaction journal_id."""
+    model = app._UsageModel()
+    for term, count in counts.items():
+        model.add(term, count)
+    app._save_usage(model, _JOURNAL_ID)
+    with open(app._usage_journal_path(), 'w', encoding='utf-8') as f:
+        f.write('#' + journal_id + '\n' + journal)
+
+
+def _usage_values() -> dict:
+    model, _, _ = app._load_usage()
+    return {term: round(value, 3) for term, value in model.items()}
+
+
+def test_usage_journal_replays_on_top_of_usage_file():
+    half_life_ago = time.time() - app.USAGE_HALF_LIFE_DAYS * 86400
+    _write_usage({'apple': 2}, 'apple\t1\t%.0f\nbanana\t3\n' % half_life_ago)
+    # A line without a timestamp predates decay and counts as now.
+    assert _usage_values() == {'apple': 2.5, 'banana': 3.0}
+
+
+def test_usage_journal_of_another_compaction_is_ignored():
+    # Crash mid-compaction: usage.bin already holds these entries.
+    _write_usage({'apple': 2}, 'apple\t5\n', journal_id='fedcba9876543210')
+    assert _usage_values() == {'apple': 2.0}
+
+
+def test_usage_journal_torn_last_line_is_dropped():
+    _write_usage({}, 'banana\t1\t%.0f\ncherry\t4' % time.time())
+    assert _usage_values() == {'banana': 1.0}
+
+
+def test_usage_counts_migrate_from_config():
+    with open(app._config_path(), 'w', encoding='utf-8') as f:
+        json.dump({'usage': {'apple': 4, 'banana': 'x', 'cherry': 1}}, f)
+    assert _usage_values() == {'apple': 4.0, 'cherry': 1.0}